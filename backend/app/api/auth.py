@@ -1,26 +1,57 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.core.security import create_access_token
-from app.crud.user import user_crud
-from app.schemas.user import UserCreate, UserCreateOAuth, Token, User, UserLogin
+from app.core.config import settings
+from app.core.database import get_db, get_async_db
+from app.core.security import (
+    create_access_token, create_refresh_token, decode_token, REFRESH_TOKEN, PasswordHashQueueFull
+)
+from app.crud.user import user_crud, async_user_crud
+from app.schemas.user import UserCreate, UserCreateOAuth, Token, TokenRefresh, User, UserLogin
+from app.services.token_epochs import token_epochs
 from app.api.dependencies import get_current_user
 
 router = APIRouter()
 
+async def _issue_tokens(user) -> Token:
+    """Access token with the user's auth claims, plus a refresh token"""
+    epoch = await token_epochs.get(user.id)
+    access_token = create_access_token(
+        subject=user.id,
+        claims={"act": bool(user.is_active), "su": bool(user.is_superuser), "ep": epoch}
+    )
+    
+    return Token(
+        access_token=access_token,
+        refresh_token=create_refresh_token(subject=user.id, epoch=epoch),
+        token_type="bearer",
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        user=User.from_orm(user)
+    )
+
+def _hash_queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts in progress, try again shortly",
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/login", response_model=Token)
 async def login(
     user_credentials: UserLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login with email and password"""
-    user = user_crud.authenticate(
-        db, 
-        email=user_credentials.email, 
-        password=user_credentials.password
-    )
+    try:
+        user = await async_user_crud.authenticate(
+            db, 
+            email=user_credentials.email, 
+            password=user_credentials.password
+        )
+    except PasswordHashQueueFull:
+        raise _hash_queue_full()
     
     if not user:
         raise HTTPException(
@@ -34,22 +65,16 @@ async def login(
             detail="Inactive user"
         )
     
-    access_token = create_access_token(subject=user.id)
-    
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=User.from_orm(user)
-    )
+    return await _issue_tokens(user)
 
 @router.post("/register", response_model=Token)
 async def register(
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register new user"""
     # Check if user already exists
-    existing_user = user_crud.get_by_email(db, email=user_in.email)
+    existing_user = await async_user_crud.get_by_email(db, email=user_in.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -57,16 +82,13 @@ async def register(
         )
     
     # Create new user
-    user = user_crud.create(db, user_in=user_in)
+    try:
+        user = await async_user_crud.create(db, user_in=user_in)
+    except PasswordHashQueueFull:
+        raise _hash_queue_full()
     
-    # Create access token
-    access_token = create_access_token(subject=user.id)
-    
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=User.from_orm(user)
-    )
+    # Create access and refresh tokens
+    return await _issue_tokens(user)
 
 @router.post("/google", response_model=Token)
 async def google_auth(
@@ -103,14 +125,8 @@ async def google_auth(
             detail="Inactive user"
         )
     
-    # Create access token
-    access_token = create_access_token(subject=user.id)
-    
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=User.from_orm(user)
-    )
+    # Create access and refresh tokens
+    return await _issue_tokens(user)
 
 @router.get("/me", response_model=User)
 async def get_current_user_info(
@@ -121,16 +137,32 @@ async def get_current_user_info(
 
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
-    current_user: User = Depends(get_current_user)
+    token_in: TokenRefresh,
+    db: Session = Depends(get_db)
 ):
-    """Refresh access token"""
-    access_token = create_access_token(subject=current_user.id)
+    """Exchange a refresh token for a new access and refresh token"""
+    claims = decode_token(token_in.refresh_token, token_type=REFRESH_TOKEN)
+    if not claims or await token_epochs.is_revoked(int(claims["sub"]), claims.get("ep", 0)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
     
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=User.from_orm(current_user)
-    )
+    # Refreshing re-reads the user, so claims never outlive an access token
+    user = user_crud.get(db, user_id=int(claims["sub"]))
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+    
+    if not user_crud.is_active(user):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    
+    return await _issue_tokens(user)
 
 @router.post("/test-token", response_model=User)
 async def test_token(
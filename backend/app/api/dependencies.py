@@ -1,30 +1,59 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import verify_token
-from app.crud.user import user_crud
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.security import decode_token
+from app.crud.user import user_crud, async_user_crud
 from app.models.user import User
+from app.services.user_cache import user_auth_cache
+from app.services.token_epochs import token_epochs
 
 # Security scheme
 security = HTTPBearer()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    token = credentials.credentials
-    user_id = verify_token(token)
+async def _get_auth_user(db: AsyncSession, user_id: int) -> User | None:
+    """Load the token's user, from user_auth_cache when possible"""
+    user = user_auth_cache.get(user_id)
+    if user is None:
+        user = await async_user_crud.get(db, user_id=user_id)
+        if user:
+            user_auth_cache.set(user)
+    return user
+
+async def get_token_claims(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """Verify the bearer access token and its epoch without touching the database"""
+    claims = decode_token(credentials.credentials)
     
-    if not user_id:
+    if not claims:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = user_crud.get(db, user_id=int(user_id))
+    if await token_epochs.is_revoked(int(claims["sub"]), claims.get("ep", 0)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if not claims.get("act", True):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    
+    return claims
+
+async def get_current_user(
+    claims: dict = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Get current authenticated user"""
+    user = await _get_auth_user(db, int(claims["sub"]))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,10 +81,13 @@ async def get_current_active_user(
     return current_user
 
 async def get_current_superuser(
+    claims: dict = Depends(get_token_claims),
     current_user: User = Depends(get_current_user)
 ) -> User:
     """Get current superuser"""
-    if not user_crud.is_superuser(current_user):
+    # The su claim is authoritative: changing is_superuser bumps the token epoch
+    is_superuser = claims["su"] if "su" in claims else user_crud.is_superuser(current_user)
+    if not is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user doesn't have enough privileges"
@@ -65,20 +97,23 @@ async def get_current_superuser(
 # Optional authentication (for public endpoints that can work with or without auth)
 async def get_current_user_optional(
     credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer(auto_error=False)),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User | None:
     """Get current user if authenticated, otherwise None"""
     if not credentials:
         return None
     
     try:
-        token = credentials.credentials
-        user_id = verify_token(token)
+        claims = decode_token(credentials.credentials)
+        
+        if not claims or not claims.get("act", True):
+            return None
         
-        if not user_id:
+        user_id = int(claims["sub"])
+        if await token_epochs.is_revoked(user_id, claims.get("ep", 0)):
             return None
         
-        user = user_crud.get(db, user_id=int(user_id))
+        user = await _get_auth_user(db, user_id)
         if not user or not user_crud.is_active(user):
             return None
         
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import math
 
-from app.core.database import get_db
-from app.crud.reservation import reservation_crud
+from app.core.database import get_db, get_async_db
+from app.core.pagination import next_page_cursor, COUNT_MODE_PATTERN
+from app.crud.reservation import reservation_crud, async_reservation_crud
 from app.schemas.reservation import (
     ReservationCreate, ReservationUpdate, Reservation, 
     ReservationList, ReservationFilter
@@ -37,10 +39,12 @@ async def get_reservations(
     reminder_sent: Optional[bool] = Query(None, description="Reminder sent filter"),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Page size"),
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Cursor from next_cursor, replaces page"),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="How to compute total: exact, capped, estimate or cached"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get reservations with filters and pagination"""
+    """Get reservations with filters and page-number or cursor pagination"""
     
     filters = ReservationFilter(
         search=search,
@@ -49,19 +53,35 @@ async def get_reservations(
         vaccine_type=vaccine_type,
         reminder_sent=reminder_sent,
         page=page,
-        size=size
+        size=size,
+        after=after,
+        count=count
     )
     
-    reservations, total = reservation_crud.get_multi_filtered(db=db, filters=filters)
+    try:
+        reservations, total, total_exact = await async_reservation_crud.get_multi_filtered(db=db, filters=filters)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
     
     pages = math.ceil(total / size)
     
+    # Search pages are ranked by relevance, which a (created_at, id) cursor can't continue
+    next_cursor = None
+    if len(reservations) == size and (after or not search):
+        last = reservations[-1]
+        next_cursor = next_page_cursor(last.created_at, last.id, after)
+    
     return ReservationList(
         reservations=[Reservation.from_orm(r) for r in reservations],
         total=total,
         page=page,
         size=size,
-        pages=pages
+        pages=pages,
+        total_exact=total_exact,
+        next_cursor=next_cursor
     )
 
 @router.get("/{reservation_id}", response_model=Reservation)
@@ -160,11 +180,11 @@ async def mark_reminder_sent(
 
 @router.get("/statistics/overview")
 async def get_statistics(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get reservation statistics"""
-    stats = reservation_crud.get_statistics(db=db)
+    stats = await async_reservation_crud.get_statistics(db=db)
     return stats
 
 @router.get("/search/by-phone/{phone_number}")
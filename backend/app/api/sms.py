@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import math
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, get_async_db
+from app.core.pagination import next_page_cursor, COUNT_MODE_PATTERN
 from app.services.sms_service import sms_service
+from app.services.sms_templates import compile_template, TemplateError
 from app.crud.reservation import reservation_crud
 from app.schemas.sms import (
     SMSSend, SMSBulkSend, SMS, SMSList, SMSFilter, 
@@ -22,6 +26,29 @@ async def send_sms(
     current_user: User = Depends(get_current_user)
 ):
     """Send single SMS"""
+    if settings.SMS_USE_OUTBOX:
+        result = sms_service.enqueue_sms(
+            db=db,
+            phone=sms_data.recipient_phone,
+            message=sms_data.message,
+            recipient_name=sms_data.recipient_name,
+            sent_by_user_id=current_user.id,
+            reservation_id=sms_data.reservation_id,
+            sms_type=sms_data.sms_type
+        )
+        
+        if not result["success"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=result.get("error", "Failed to queue SMS")
+            )
+        
+        return {
+            "message": "SMS queued for sending",
+            "archive_id": result["archive_id"],
+            "status": result["status"]
+        }
+    
     result = await sms_service.send_sms(
         db=db,
         phone=sms_data.recipient_phone,
@@ -39,7 +66,7 @@ async def send_sms(
         )
     
     return {
-        "message": "SMS sent successfully",
+        "message": "SMS queued for sending" if result.get("queued") else "SMS sent successfully",
         "archive_id": result["archive_id"],
         "message_id": result.get("message_id")
     }
@@ -51,16 +78,27 @@ async def send_bulk_sms(
     current_user: User = Depends(get_current_user)
 ):
     """Send bulk SMS"""
-    result = await sms_service.send_bulk_sms(
-        db=db,
-        recipients=sms_data.recipients,
-        message=sms_data.message,
-        sent_by_user_id=current_user.id,
-        sms_type=sms_data.sms_type
-    )
+    if settings.SMS_USE_OUTBOX:
+        result = sms_service.enqueue_bulk_sms(
+            db=db,
+            recipients=sms_data.recipients,
+            message=sms_data.message,
+            sent_by_user_id=current_user.id,
+            sms_type=sms_data.sms_type
+        )
+        summary = f"Bulk SMS queued. {result['success_count']} queued, {result['fail_count']} failed"
+    else:
+        result = await sms_service.send_bulk_sms(
+            db=db,
+            recipients=sms_data.recipients,
+            message=sms_data.message,
+            sent_by_user_id=current_user.id,
+            sms_type=sms_data.sms_type
+        )
+        summary = f"Bulk SMS completed. {result['success_count']} sent, {result['fail_count']} failed"
     
     return {
-        "message": f"Bulk SMS completed. {result['success_count']} sent, {result['fail_count']} failed",
+        "message": summary,
         "total": result["total"],
         "success_count": result["success_count"],
         "fail_count": result["fail_count"],
@@ -89,12 +127,18 @@ async def send_reminder_sms(
             detail="Reminder already sent for this reservation"
         )
     
-    result = await sms_service.send_reminder_sms(
-        db=db,
-        reservation=reservation,
-        template=template,
-        sent_by_user_id=current_user.id
-    )
+    try:
+        result = await sms_service.send_reminder_sms(
+            db=db,
+            reservation=reservation,
+            template=template,
+            sent_by_user_id=current_user.id
+        )
+    except TemplateError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     if not result["success"]:
         raise HTTPException(
@@ -103,45 +147,93 @@ async def send_reminder_sms(
         )
     
     return {
-        "message": "Reminder SMS sent successfully",
+        "message": "Reminder SMS queued for sending" if result.get("queued") else "Reminder SMS sent successfully",
         "archive_id": result["archive_id"],
         "message_id": result.get("message_id")
     }
 
+@router.post("/send-reminders", response_model=dict)
+async def send_pending_reminders(
+    template: str = Query(..., description="SMS template"),
+    days_before: int = Query(1, ge=1, le=7, description="Days before appointment"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Send reminder SMS for all pending reservations in provider batches"""
+    try:
+        compile_template(template)
+    except TemplateError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # Same locked claim as the reminder scheduler, so a manual run can't double-send
+    result = await sms_service.send_due_reminders(
+        db=db,
+        template=template,
+        sent_by_user_id=current_user.id,
+        days_before=days_before
+    )
+    
+    return {
+        "message": f"Reminders completed. {result['sent']} sent, {result['failed']} failed",
+        "total": result["total"],
+        "success_count": result["sent"],
+        "fail_count": result["failed"]
+    }
+
 @router.get("/archive", response_model=SMSList)
 async def get_sms_archive(
     search: Optional[str] = Query(None, description="Search term"),
     sms_type: Optional[str] = Query("all", description="SMS type filter"),
-    status: Optional[str] = Query("all", description="Status filter"),
+    status_filter: Optional[str] = Query("all", alias="status", description="Status filter"),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Page size"),
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Cursor from next_cursor, replaces page"),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="How to compute total: exact, capped, estimate or cached"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get SMS archive with filters and pagination"""
+    """Get SMS archive with filters and page-number or cursor pagination"""
     
     filters = {
         "search": search,
         "sms_type": sms_type,
-        "status": status
+        "status": status_filter,
+        "after": after,
+        "count": count
     }
     
     skip = (page - 1) * size
-    records, total = sms_service.get_sms_archive(
-        db=db, 
-        filters=filters,
-        skip=skip,
-        limit=size
-    )
+    try:
+        records, total, total_exact = await sms_service.get_sms_archive_async(
+            db=db, 
+            filters=filters,
+            skip=skip,
+            limit=size
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
     
     pages = math.ceil(total / size)
     
+    next_cursor = None
+    if len(records) == size:
+        last = records[-1]
+        next_cursor = next_page_cursor(last.sent_at, last.id, after)
+    
     return SMSList(
         sms_records=[SMS.from_orm(r) for r in records],
         total=total,
         page=page,
         size=size,
-        pages=pages
+        pages=pages,
+        total_exact=total_exact,
+        next_cursor=next_cursor
     )
 
 @router.get("/statistics", response_model=SMSStats)
@@ -153,6 +245,13 @@ async def get_sms_statistics(
     stats = sms_service.get_sms_statistics(db=db)
     return SMSStats(**stats)
 
+@router.get("/provider/status", response_model=dict)
+async def get_sms_provider_status(
+    current_user: User = Depends(get_current_user)
+):
+    """Get SMS provider circuit breaker state for this worker"""
+    return sms_service.circuit_breaker.snapshot()
+
 @router.get("/scheduled", response_model=list[ScheduledSMS])
 async def get_scheduled_sms(
     days_ahead: int = Query(7, ge=1, le=30, description="Days ahead to check"),
@@ -224,9 +323,7 @@ async def test_sms_config(
 ):
     """Test SMS configuration"""
     # Test if SMS service is properly configured
-    from app.core.config import settings
-    
-    if not settings.SMS_API_KEY:
+    if not sms_service.provider.is_configured():
         return {
             "configured": False,
             "message": "SMS API key not configured"
@@ -235,6 +332,6 @@ async def test_sms_config(
     return {
         "configured": True,
         "message": "SMS service is properly configured",
-        "provider": "Kavenegar",
+        "provider": sms_service.provider.name,
         "sender": settings.SMS_SENDER
     }
\ No newline at end of file
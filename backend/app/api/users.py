@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import os
 import uuid
 from PIL import Image
 import io
 
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.core.config import settings
-from app.crud.user import user_crud
+from app.crud.user import user_crud, async_user_crud
 from app.schemas.user import User, UserUpdate
 from app.api.dependencies import get_current_user, get_current_superuser
 from app.models.user import User as UserModel
@@ -25,11 +26,11 @@ async def get_current_user_profile(
 @router.put("/me", response_model=User)
 async def update_current_user(
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_user)
 ):
     """Update current user profile"""
-    updated_user = user_crud.update(
+    updated_user = await async_user_crud.update(
         db=db, 
         user_id=current_user.id, 
         user_in=user_update
@@ -46,7 +47,7 @@ async def update_current_user(
 @router.post("/me/upload-avatar", response_model=dict)
 async def upload_user_avatar(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_user)
 ):
     """Upload user avatar"""
@@ -98,7 +99,7 @@ async def upload_user_avatar(
         profile_picture_url = f"/uploads/profile_pics/{unique_filename}"
         user_update = UserUpdate(profile_picture=profile_picture_url)
         
-        updated_user = user_crud.update(
+        updated_user = await async_user_crud.update(
             db=db, 
             user_id=current_user.id, 
             user_in=user_update
@@ -154,11 +155,11 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_superuser)
 ):
     """Update user (admin only)"""
-    updated_user = user_crud.update(
+    updated_user = await async_user_crud.update(
         db=db, 
         user_id=user_id, 
         user_in=user_update
@@ -175,7 +176,7 @@ async def update_user(
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_superuser)
 ):
     """Delete user (admin only)"""
@@ -186,7 +187,7 @@ async def delete_user(
             detail="Cannot delete your own account"
         )
     
-    success = user_crud.delete(db=db, user_id=user_id)
+    success = await async_user_crud.delete(db=db, user_id=user_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -198,11 +199,11 @@ async def delete_user(
 @router.post("/{user_id}/toggle-active")
 async def toggle_user_active(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_superuser)
 ):
     """Toggle user active status (admin only)"""
-    user = user_crud.get(db=db, user_id=user_id)
+    user = await async_user_crud.get(db=db, user_id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -217,7 +218,7 @@ async def toggle_user_active(
         )
     
     user_update = UserUpdate(is_active=not user.is_active)
-    updated_user = user_crud.update(
+    updated_user = await async_user_crud.update(
         db=db, 
         user_id=user_id, 
         user_in=user_update
@@ -235,14 +236,4 @@ async def get_user_statistics(
     current_user: UserModel = Depends(get_current_superuser)
 ):
     """Get user statistics (admin only)"""
-    total_users = len(user_crud.get_multi(db=db, skip=0, limit=1000))  # Quick count
-    active_users = len([u for u in user_crud.get_multi(db=db, skip=0, limit=1000) if u.is_active])
-    oauth_users = len([u for u in user_crud.get_multi(db=db, skip=0, limit=1000) if u.google_id])
-    
-    return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "inactive_users": total_users - active_users,
-        "oauth_users": oauth_users,
-        "regular_users": total_users - oauth_users
-    }
\ No newline at end of file
+    return user_crud.count(db=db)
\ No newline at end of file
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Hashable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after ttl seconds
+    
+    Keys are tuples whose first item is a namespace (usually a table name),
+    so every entry derived from one table can be dropped after a write.
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def invalidate(self, namespace: Hashable):
+        """Drop every entry whose key starts with namespace"""
+        with self._lock:
+            stale = [
+                key for key in self._data
+                if key == namespace or (isinstance(key, tuple) and key[:1] == (namespace,))
+            ]
+            for key in stale:
+                del self._data[key]
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Caches whose namespaces are table names, dropped when a session commits writes to that table
+_table_caches: List[TTLCache] = []
+
+def invalidate_on_write(cache: TTLCache) -> TTLCache:
+    """Register a cache to be invalidated per table after every committed write"""
+    _table_caches.append(cache)
+    return cache
+
+def _written_tables(session: Session) -> set:
+    return session.info.setdefault("written_tables", set())
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            _written_tables(session).add(table.name)
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_writes(orm_execute_state):
+    # insert()/update()/delete() statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _written_tables(orm_execute_state.session).add(table.name)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_tables(session):
+    for table_name in session.info.pop("written_tables", ()):
+        for cache in _table_caches:
+            cache.invalidate(table_name)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_written_tables(session):
+    session.info.pop("written_tables", None)
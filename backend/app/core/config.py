@@ -10,8 +10,16 @@ class Settings(BaseSettings):
     
     # Security
     SECRET_KEY: str = "your-super-secret-key-change-this-in-production"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    TOKEN_EPOCH_CACHE_TTL: float = 5.0  # seconds a revocation may take to reach this worker
+    BCRYPT_ROUNDS: int = 12  # changing it rehashes passwords on next login
+    PASSWORD_HASH_WORKERS: int = 4  # threads for bcrypt, off the event loop
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64  # queued + running hashes before 503
     ALGORITHM: str = "HS256"
+    AUTH_CACHE_TTL: float = 30.0  # seconds a user stays cached in get_current_user, 0 = off
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_REDIS_INVALIDATION: bool = False  # broadcast invalidations to other workers
     
     # Database
     POSTGRES_SERVER: str = "localhost"
@@ -24,13 +32,69 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
     
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+    
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # List endpoints
+    LIST_COUNT_CAP: int = 1000  # count=capped stops here and reports "1000+"
+    LIST_COUNT_CACHE_TTL: float = 30.0  # seconds, count=cached
+    STATISTICS_CACHE_TTL: float = 30.0  # seconds, dashboard statistics
+    METRICS_TIMEZONE: str = "UTC"  # calendar days for the SMS rollup, e.g. Asia/Tehran
+    
     # SMS Settings
+    SMS_PROVIDER: str = "kavenegar"  # kavenegar, fake
     SMS_API_KEY: str = ""
     SMS_API_URL: str = "https://api.kavenegar.com/v1"
     SMS_SENDER: str = "10004346"
+    SMS_CONNECT_TIMEOUT: float = 5.0
+    SMS_READ_TIMEOUT: float = 10.0
+    SMS_MAX_CONNECTIONS: int = 50
+    SMS_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SMS_HTTP2: bool = True
+    SMS_BULK_CONCURRENCY: int = 10
+    SMS_BATCH_SIZE: int = 200  # receptors per sendarray call
+    SMS_RATE_LIMIT_PER_SECOND: float = 5.0  # provider calls per second, all workers
+    SMS_RATE_LIMIT_BURST: int = 10
+    SMS_RATE_LIMIT_USE_REDIS: bool = True
+    SMS_BACKOFF_BASE: float = 1.0  # seconds, doubled on each throttled call
+    SMS_BACKOFF_MAX: float = 60.0
+    SMS_RETRY_ATTEMPTS: int = 3
+    SMS_RETRY_BASE_DELAY: float = 0.5  # seconds, full jitter
+    SMS_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    SMS_CIRCUIT_RECOVERY_TIMEOUT: float = 30.0  # seconds before a half-open probe
+    SMS_CIRCUIT_HALF_OPEN_CALLS: int = 1
+    SMS_QUEUE_WHEN_CIRCUIT_OPEN: bool = True
+    
+    # Fake SMS provider (SMS_PROVIDER=fake, for local load tests)
+    SMS_FAKE_LATENCY_MS: float = 50.0
+    SMS_FAKE_ERROR_RATE: float = 0.0  # 0..1 share of calls that fail with a throttling 503
+    SMS_FAKE_THROTTLE_PER_SECOND: int = 0  # calls per second before 429, 0 = off
+    
+    # SMS Outbox
+    SMS_USE_OUTBOX: bool = True
+    SMS_OUTBOX_BATCH_SIZE: int = 500
+    SMS_OUTBOX_MAX_ATTEMPTS: int = 5
+    SMS_OUTBOX_RETRY_DELAY: int = 30  # seconds, doubled on every retry
+    SMS_OUTBOX_LEASE_SECONDS: int = 120
+    SMS_OUTBOX_POLL_INTERVAL: float = 1.0
+    
+    # SMS Delivery Status Poller
+    SMS_STATUS_POLL_INTERVAL: int = 60  # seconds between runs
+    SMS_STATUS_MAX_AGE_HOURS: int = 72  # stop polling older messages
+    SMS_STATUS_BATCH_SIZE: int = 500  # message IDs per status call
+    
+    # Reminder Scheduler
+    REMINDER_DAYS_BEFORE: int = 1
+    REMINDER_BATCH_SIZE: int = 500
+    REMINDER_INTERVAL: int = 60  # seconds between runs
+    REMINDER_RETRY_DELAY: int = 1800  # seconds before a failed reminder is tried again
+    REMINDER_MAX_ATTEMPTS: int = 3
+    REMINDER_SENDER_USER_ID: Optional[int] = None  # defaults to the first superuser
+    REMINDER_TEMPLATE: str = "سلام [نام صاحب]، یادآوری واکسن [نام حیوان] برای تاریخ [تاریخ]. کلینیک پارسیان"
     
     # Email Settings (Optional)
     SMTP_HOST: Optional[str] = None
@@ -47,6 +111,20 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: Optional[str] = None
     GOOGLE_CLIENT_SECRET: Optional[str] = None
     
+    # Event-loop lag monitor (GET /debug/loop-lag)
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL_MS: float = 20.0
+    LOOP_MONITOR_THRESHOLD_MS: float = 100.0  # stalls shorter than this are not attributed
+    
+    # Per-request SQL profiler (X-SQL-Profile header); logs parameters, debug only
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_SLOW_QUERY_MS: float = 100.0
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # identical statements per request reported as N+1
+    
+    # Prometheus metrics (GET /metrics)
+    METRICS_ENABLED: bool = False  # unauthenticated; keep /metrics off public ports
+    WORKER_METRICS_PORT: int = 0  # SMS workers serve /metrics on this port; 0 disables
+    
     # CORS
     BACKEND_CORS_ORIGINS: list = [
         "http://localhost:3000",
@@ -1,11 +1,60 @@
+import time
+from typing import Callable, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
 
+CONNECT_SECONDS = "connect_seconds"
+
+class TimedCheckout:
+    """Reports how long each checkout waited for a free pooled connection
+    
+    Pool events have no hook before a checkout starts, so the wait is timed around
+    _do_get. Time spent opening a new connection is not waiting and is left out.
+    dispose() recreates the pool from its class, so the timing survives it.
+    """
+    
+    # Set by core/metrics.instrument_pools
+    wait_observer: Optional[Callable[[float], None]] = None
+    
+    def _create_connection(self):
+        start = time.perf_counter()
+        record = super()._create_connection()
+        record.info[CONNECT_SECONDS] = time.perf_counter() - start
+        return record
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        record = super()._do_get()
+        waited = time.perf_counter() - start - record.info.pop(CONNECT_SECONDS, 0.0)
+        if self.wait_observer is not None:
+            self.wait_observer(max(0.0, waited))
+        return record
+
+class TimedQueuePool(TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.DATABASE_URL,
+    poolclass=TimedQueuePool,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_size=20,
+    max_overflow=0
+)
+
+# Create async SQLAlchemy engine (asyncpg)
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    poolclass=TimedAsyncAdaptedQueuePool,
     pool_pre_ping=True,
     pool_recycle=300,
     pool_size=20,
@@ -15,6 +64,15 @@ engine = create_engine(
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create AsyncSessionLocal class
+# expire_on_commit=False so objects stay readable after commit without lazy IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create Base class
 Base = declarative_base()
 
@@ -24,4 +82,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
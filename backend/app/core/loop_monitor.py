@@ -0,0 +1,178 @@
+"""Opt-in event-loop lag monitor with per-route blocking attribution
+
+A heartbeat coroutine measures how late the loop wakes it (event-loop lag).
+A watchdog thread checks that heartbeat every interval; while it is stale
+beyond the threshold, the loop thread is blocked, so the watchdog samples
+that thread's stack, finds the route endpoint on it and charges the stall
+to that route. This works with uvloop and needs no per-request hooks.
+
+Enable with LOOP_MONITOR_ENABLED=true; counters are served at
+GET /debug/loop-lag.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict
+from typing import Dict, Optional
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_ROUTE = "<no route>"
+
+class LoopMonitor:
+    def __init__(self, interval_ms: Optional[float] = None, threshold_ms: Optional[float] = None):
+        self.interval = (interval_ms or settings.LOOP_MONITOR_INTERVAL_MS) / 1000
+        self.threshold = (threshold_ms or settings.LOOP_MONITOR_THRESHOLD_MS) / 1000
+        
+        # Event-loop lag, seconds
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.ticks = 0
+        
+        # Per-route blocking, from stack samples
+        self.blocked_ms: Dict[str, float] = defaultdict(float)
+        self.stalls: Dict[str, int] = defaultdict(int)
+        self.last_blocking_call: Dict[str, str] = {}
+        
+        self._routes: Dict[object, str] = {}
+        self._heartbeat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._in_stall = False
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+    
+    def register_routes(self, app: FastAPI):
+        """Map endpoint code objects to route labels"""
+        for route in app.routes:
+            if isinstance(route, APIRoute):
+                methods = ",".join(sorted(route.methods or []))
+                self._routes[route.endpoint.__code__] = f"{methods} {route.path}"
+    
+    def start(self):
+        """Start the heartbeat and watchdog (call from the running loop)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+    
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _beat(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            
+            lag = max(0.0, time.perf_counter() - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            self.ticks += 1
+    
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            stalled_for = time.perf_counter() - self._heartbeat - self.interval
+            if stalled_for < self.threshold:
+                self._in_stall = False
+                continue
+            
+            frame = sys._current_frames().get(self._loop_thread_id)
+            route, call = self._attribute(frame)
+            
+            # The first sample of a stall also covers the time before the threshold
+            charged = stalled_for if not self._in_stall else self.interval
+            with self._lock:
+                self.blocked_ms[route] += charged * 1000
+                if not self._in_stall:
+                    self.stalls[route] += 1
+                self.last_blocking_call[route] = call
+            
+            if not self._in_stall:
+                logger.warning(
+                    "Event loop blocked for %.0f ms in %s at %s",
+                    stalled_for * 1000, route, call
+                )
+            self._in_stall = True
+    
+    def _attribute(self, frame) -> tuple:
+        """Route whose endpoint is on the stack, and the innermost call"""
+        if frame is None:
+            return UNKNOWN_ROUTE, "?"
+        
+        innermost = traceback.extract_stack(frame, limit=1)[-1]
+        call = f"{innermost.filename}:{innermost.lineno} {innermost.name}"
+        
+        while frame is not None:
+            route = self._routes.get(frame.f_code)
+            if route:
+                return route, call
+            frame = frame.f_back
+        return UNKNOWN_ROUTE, call
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            blocked = sorted(self.blocked_ms.items(), key=lambda item: -item[1])
+            stalls = dict(self.stalls)
+            calls = dict(self.last_blocking_call)
+        
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {
+                "last": round(self.last_lag * 1000, 2),
+                "max": round(self.max_lag * 1000, 2),
+                "mean": round(self.total_lag / self.ticks * 1000, 2) if self.ticks else 0.0
+            },
+            "routes": {
+                route: {
+                    "blocked_ms": round(blocked_ms, 1),
+                    "stalls": stalls.get(route, 0),
+                    "last_blocking_call": calls.get(route)
+                }
+                for route, blocked_ms in blocked
+            }
+        }
+
+loop_monitor = LoopMonitor()
+
+def install_loop_monitor(app: FastAPI):
+    """Wire the monitor into the app if LOOP_MONITOR_ENABLED is set"""
+    if not settings.LOOP_MONITOR_ENABLED:
+        return
+    
+    @app.on_event("startup")
+    async def start_loop_monitor():
+        loop_monitor.register_routes(app)
+        loop_monitor.start()
+    
+    @app.on_event("shutdown")
+    async def stop_loop_monitor():
+        await loop_monitor.stop()
+    
+    @app.get("/debug/loop-lag", include_in_schema=False)
+    async def get_loop_lag():
+        """Event-loop lag and per-route blocked time for this worker"""
+        return loop_monitor.snapshot()
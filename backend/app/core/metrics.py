@@ -0,0 +1,165 @@
+"""Prometheus metrics served at GET /metrics
+
+- HTTP: per-route latency histograms, request counts by status and
+  in-flight gauges, recorded by a plain ASGI middleware. Routes are
+  labelled by their path template, so ids never reach label values.
+- DB pools: checked-out connections and overflow for the sync and async
+  engines in core/database.py, read at scrape time, and checkout wait
+  time reported by their TimedCheckout pools.
+- SMS provider: per-attempt call latency and outcome counters, recorded
+  in SMSService._call_provider.
+
+Off by default (METRICS_ENABLED): /metrics has no authentication, so only
+enable it where the API port is not public or the proxy blocks the path.
+
+Metrics live in this process's default registry, so each API worker (and
+each SMS worker with WORKER_METRICS_PORT set) is scraped on its own.
+"""
+import time
+from typing import Dict, Tuple
+
+from fastapi import FastAPI
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+)
+from sqlalchemy.pool import QueuePool
+from starlette.responses import Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.database import engine, async_engine, TimedCheckout
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method", "route"]
+)
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured connection pool size", ["engine"])
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections checked out of the pool", ["engine"])
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections opened beyond pool_size", ["engine"])
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection, excluding connect time",
+    ["engine"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+SMS_PROVIDER_DURATION = Histogram(
+    "sms_provider_request_duration_seconds",
+    "SMS provider call latency per attempt",
+    ["provider", "operation"],
+    buckets=LATENCY_BUCKETS
+)
+SMS_PROVIDER_CALLS = Counter(
+    "sms_provider_calls_total",
+    "SMS provider calls by outcome (success, throttled, error, circuit_open, not_configured)",
+    ["provider", "operation", "outcome"]
+)
+
+class PrometheusMiddleware:
+    """Records latency, status and in-flight requests per route template"""
+    
+    MAX_CACHED_PATHS = 4096
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._labels: Dict[Tuple[str, str], str] = {}
+    
+    def _route_label(self, scope: Scope) -> str:
+        key = (scope["method"], scope["path"])
+        label = self._labels.get(key)
+        if label is not None:
+            return label
+        
+        label = UNMATCHED_ROUTE
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                label = route.path or "/"
+                break
+            if match == Match.PARTIAL and label == UNMATCHED_ROUTE:
+                # Path matches but the method does not (405)
+                label = route.path or "/"
+        
+        # Paths with ids are unbounded; start over rather than grow forever
+        if len(self._labels) >= self.MAX_CACHED_PATHS:
+            self._labels.clear()
+        self._labels[key] = label
+        return label
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        route = self._route_label(scope)
+        status_code = 500
+        
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            in_flight.dec()
+
+def instrument_pools():
+    """Export pool gauges and checkout wait for the sync and async engines"""
+    for name, sync_engine in (("sync", engine), ("async", async_engine.sync_engine)):
+        # NullPool / SingletonThreadPool (e.g. SQLite) have no size() or overflow()
+        if not isinstance(sync_engine.pool, QueuePool):
+            continue
+        
+        # On the pool class, so the pool dispose() creates keeps reporting
+        if isinstance(sync_engine.pool, TimedCheckout):
+            type(sync_engine.pool).wait_observer = DB_POOL_WAIT.labels(name).observe
+        
+        # Look the pool up on every scrape: dispose() swaps it for a new one
+        DB_POOL_SIZE.labels(name).set_function(lambda e=sync_engine: e.pool.size())
+        DB_POOL_CHECKED_OUT.labels(name).set_function(lambda e=sync_engine: e.pool.checkedout())
+        DB_POOL_OVERFLOW.labels(name).set_function(lambda e=sync_engine: max(0, e.pool.overflow()))
+
+def install_metrics(app: FastAPI):
+    """Add the metrics middleware and GET /metrics if METRICS_ENABLED is set"""
+    if not settings.METRICS_ENABLED:
+        return
+    
+    app.add_middleware(PrometheusMiddleware)
+    instrument_pools()
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        """Prometheus text exposition for this worker"""
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def start_worker_metrics_server():
+    """Serve /metrics from a background SMS worker if WORKER_METRICS_PORT is set"""
+    if settings.METRICS_ENABLED and settings.WORKER_METRICS_PORT:
+        instrument_pools()
+        start_http_server(settings.WORKER_METRICS_PORT)
@@ -0,0 +1,145 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Hashable, Optional, Tuple
+
+from sqlalchemy import func, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, invalidate_on_write
+from app.core.config import settings
+
+# How list endpoints compute `total`:
+#   exact     COUNT(*) over the filtered rows
+#   capped    count at most LIST_COUNT_CAP rows, report "cap+" as inexact
+#   estimate  planner row estimate (EXPLAIN) for unfiltered lists, capped count otherwise
+#   cached    exact count cached per filter set for LIST_COUNT_CACHE_TTL seconds
+COUNT_MODES = ("exact", "capped", "estimate", "cached")
+COUNT_MODE_PATTERN = "^(" + "|".join(COUNT_MODES) + ")$"
+
+# Keyed by (table name, *filter items), dropped when the table is written
+count_cache = invalidate_on_write(TTLCache(maxsize=1024, ttl=settings.LIST_COUNT_CACHE_TTL))
+
+# Filter fields that don't change the count
+PAGINATION_FIELDS = {"page", "size", "after", "count"}
+
+def encode_cursor(position: datetime, row_id: int) -> str:
+    """Encode a keyset position (timestamp, id) as an opaque cursor"""
+    payload = json.dumps({"t": position.isoformat(), "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_cursor, raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def _utc_millis(position: datetime) -> datetime:
+    """Naive UTC, truncated to the millisecond precision SQLite keysets compare at"""
+    if position.tzinfo is not None:
+        position = position.astimezone(timezone.utc).replace(tzinfo=None)
+    return position.replace(microsecond=position.microsecond // 1000 * 1000)
+
+def next_page_cursor(position: datetime, row_id: int, after: Optional[str] = None) -> Optional[str]:
+    """Cursor for the page after (position, row_id), None unless it moves past `after`
+    
+    Rows after a cursor never sort above it; a cursor that comes back unchanged (or
+    moves backwards) would hand the client the same pages forever.
+    """
+    if after:
+        after_position, after_id = decode_cursor(after)
+        if row_id == after_id or _utc_millis(position) > _utc_millis(after_position):
+            return None
+    return encode_cursor(position, row_id)
+
+def keyset_before(position_column, id_column, cursor: str, dialect: str = "postgresql") -> tuple:
+    """WHERE condition and ORDER BY for rows after `cursor`, newest first
+    
+    SQLite has no datetime type: server defaults store 'YYYY-MM-DD HH:MM:SS' and
+    bound datetimes 'YYYY-MM-DD HH:MM:SS.ffffff', so the column is normalized with
+    strftime and the cursor bound in the same format instead of comparing raw text.
+    """
+    position, row_id = decode_cursor(cursor)
+    
+    if dialect == "sqlite":
+        position_column = func.strftime("%Y-%m-%d %H:%M:%f", position_column)
+        position = _utc_millis(position).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    
+    condition = tuple_(position_column, id_column) < (position, row_id)
+    return condition, [position_column.desc(), id_column.desc()]
+
+def count_cache_key(table_name: str, filters: dict) -> tuple:
+    """count_cache key for a filter set"""
+    items = sorted(
+        ((name, value) for name, value in filters.items()
+         if value is not None and name not in PAGINATION_FIELDS),
+        key=lambda item: item[0]
+    )
+    return (table_name, *items)
+
+async def count_rows(
+    db: AsyncSession,
+    table,
+    conditions: list,
+    mode: str = "exact",
+    cache_key: Optional[Hashable] = None,
+    unfiltered: bool = False
+) -> Tuple[int, bool]:
+    """Count rows for a list response, returns (total, total_is_exact)"""
+    if mode == "estimate":
+        if unfiltered:
+            estimate = await _planner_estimate(db, table, conditions)
+            if estimate is not None:
+                return estimate, False
+        mode = "capped"
+    
+    if mode == "capped":
+        cap = settings.LIST_COUNT_CAP
+        limited = select(literal(1)).select_from(table).where(*conditions).limit(cap + 1).subquery()
+        total = await db.scalar(select(func.count()).select_from(limited)) or 0
+        if total > cap:
+            return cap, False
+        return total, True
+    
+    if mode == "cached" and cache_key is not None:
+        cached = count_cache.get(cache_key)
+        if cached is not None:
+            return cached, False
+    
+    total = await db.scalar(select(func.count()).select_from(table).where(*conditions)) or 0
+    
+    if mode == "cached" and cache_key is not None:
+        count_cache.set(cache_key, total)
+    return total, True
+
+async def _planner_estimate(db: AsyncSession, table, conditions: list) -> Optional[int]:
+    """Planner row estimate for the filtered rows, None if unavailable
+    
+    Read from EXPLAIN of the filtered query rather than pg_class.reltuples, which
+    is table-wide and counts rows the conditions (e.g. is_active) leave out.
+    Only used for unfiltered lists, whose conditions are constants, so inlining
+    them as literals is safe.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name != "postgresql":
+        return None
+    
+    query = select(literal(1)).select_from(table).where(*conditions).compile(
+        dialect=dialect,
+        compile_kwargs={"literal_binds": True}
+    )
+    # Already compiled SQL: run it as is instead of re-parsing it for :params
+    connection = await db.connection()
+    plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+    if isinstance(plan, str):
+        # asyncpg returns json columns undecoded
+        plan = json.loads(plan)
+    
+    try:
+        estimate = plan[0]["Plan"]["Plan Rows"]
+    except (IndexError, KeyError, TypeError):
+        return None
+    return int(estimate)
@@ -0,0 +1,17 @@
+def normalize_phone(phone: str) -> str:
+    """Normalize an Iranian phone number to E.164 (+98...), empty string if it has no digits"""
+    # int() also maps Persian/Arabic-Indic digits to ASCII
+    digits = "".join(str(int(ch)) for ch in (phone or "") if ch.isdecimal())
+    if not digits:
+        return ""
+    
+    if digits.startswith("00"):
+        digits = digits[2:]
+    
+    # Handle Iranian numbers: 0912..., 912..., 98912...
+    if digits.startswith("0"):
+        digits = "98" + digits[1:]
+    elif not digits.startswith("98"):
+        digits = "98" + digits
+    
+    return "+" + digits
@@ -0,0 +1,123 @@
+"""Opt-in per-request SQL profiler with slow-query and N+1 detection
+
+Engine events (on every Engine, so both the sync engine and the asyncpg
+engine are covered) time each statement. Statements slower than
+SQL_SLOW_QUERY_MS are logged with their parameters; inside a request the
+query count and DB time are added to that request's profile, kept in a
+context variable. A statement text seen SQL_N_PLUS_ONE_THRESHOLD times in
+one request is reported as an N+1 pattern, and the summary is returned in
+the X-SQL-Profile response header.
+
+Enable with SQL_PROFILER_ENABLED=true. Parameters are logged verbatim, so
+keep it out of production.
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "X-SQL-Profile"
+MAX_LOGGED_PARAMS = 500
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slow = 0
+        self.statements: Counter = Counter()
+    
+    def record(self, statement: str, elapsed: float, slow: bool):
+        self.queries += 1
+        self.db_time += elapsed
+        self.slow += slow
+        self.statements[statement] += 1
+    
+    def repeated(self) -> List[tuple]:
+        """(statement, count) pairs at or over the N+1 threshold, most repeated first"""
+        threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+    
+    def header(self) -> str:
+        return (
+            f"queries={self.queries}; db_ms={self.db_time * 1000:.1f}; "
+            f"slow={self.slow}; n_plus_one={len(self.repeated())}"
+        )
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    slow = elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS
+    
+    if slow:
+        params = repr(parameters)
+        if len(params) > MAX_LOGGED_PARAMS:
+            params = params[:MAX_LOGGED_PARAMS] + "..."
+        logger.warning("Slow query (%.1f ms): %s | params: %s", elapsed * 1000, statement, params)
+    
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed, slow)
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not run for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+class QueryProfilerMiddleware:
+    """Collects a RequestProfile per HTTP request and reports it"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        
+        async def send_with_header(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(HEADER, profile.header())
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            current_profile.reset(token)
+            for statement, count in profile.repeated():
+                logger.warning(
+                    "Possible N+1 in %s %s: statement ran %d times: %s",
+                    scope["method"], scope["path"], count, statement
+                )
+
+def install_query_profiler(app: FastAPI):
+    """Hook engine events and add the middleware if SQL_PROFILER_ENABLED is set"""
+    if not settings.SQL_PROFILER_ENABLED:
+        return
+    
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    app.add_middleware(QueryProfilerMiddleware)
@@ -1,11 +1,32 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any
+from typing import Optional, Union, Any, Dict, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from .config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+# Password hashing; hashes with any other cost are flagged for rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+_hash_jobs = 0
+
+class PasswordHashQueueFull(Exception):
+    """Too many password hash jobs are queued, the caller should retry later"""
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -15,11 +36,32 @@ def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
+async def _run_hash_job(func, *args):
+    """Run a bcrypt call on the hash pool, rejecting work past PASSWORD_HASH_QUEUE_LIMIT"""
+    global _hash_jobs
+    if _hash_jobs >= settings.PASSWORD_HASH_QUEUE_LIMIT:
+        raise PasswordHashQueueFull()
+    
+    _hash_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_jobs -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password on the hash pool, returns (valid, new hash if the cost changed)"""
+    return await _run_hash_job(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash on the hash pool"""
+    return await _run_hash_job(pwd_context.hash, password)
+
 def create_access_token(
     subject: Union[str, Any], 
-    expires_delta: Optional[timedelta] = None
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[Dict[str, Any]] = None
 ) -> str:
-    """Create JWT access token"""
+    """Create JWT access token, with optional extra claims (act, su, ep)"""
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -27,7 +69,7 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject), "type": ACCESS_TOKEN}
     encoded_jwt = jwt.encode(
         to_encode, 
         settings.SECRET_KEY, 
@@ -35,14 +77,29 @@ def create_access_token(
     )
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
-    """Verify JWT token and return subject"""
+def create_refresh_token(subject: Union[str, Any], epoch: int = 0) -> str:
+    """Create long-lived JWT refresh token bound to the user's token epoch"""
+    expire = datetime.utcnow() + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+    to_encode = {"exp": expire, "sub": str(subject), "type": REFRESH_TOKEN, "ep": epoch}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_token(token: str, token_type: str = ACCESS_TOKEN) -> Optional[Dict[str, Any]]:
+    """Verify JWT token and return its claims, None if invalid or of another type"""
     try:
         payload = jwt.decode(
             token, 
             settings.SECRET_KEY, 
             algorithms=[settings.ALGORITHM]
         )
-        return payload.get("sub")
     except jwt.JWTError:
-        return None
\ No newline at end of file
+        return None
+    
+    # Tokens issued before the type claim existed are access tokens
+    if payload.get("type", ACCESS_TOKEN) != token_type or not payload.get("sub"):
+        return None
+    return payload
+
+def verify_token(token: str) -> Optional[str]:
+    """Verify JWT access token and return subject"""
+    payload = decode_token(token)
+    return payload.get("sub") if payload else None
@@ -0,0 +1,168 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, literal, delete, insert, cast, text, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Optional, List, Dict, Any, Iterable
+from itertools import chain
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+from app.core.config import settings
+from app.models.daily_metric import DailyMetric
+from app.models.reservation import Reservation
+from app.models.sms_archive import SMSArchive
+
+RESERVATIONS = "reservations"
+SMS = "sms"
+
+KEY_COLUMNS = ("day", "metric", "vaccine_type", "created_by", "sms_type", "status")
+
+# Rows per INSERT when rebuilding on SQLite (8 bound values each, under its 999 limit)
+SQLITE_REBUILD_CHUNK = 100
+
+def sms_day(sent_at: Optional[datetime]) -> date:
+    """Calendar day of an SMS in METRICS_TIMEZONE (today if not sent yet)"""
+    tz = ZoneInfo(settings.METRICS_TIMEZONE)
+    if sent_at is None:
+        return datetime.now(tz).date()
+    if sent_at.tzinfo is None:
+        sent_at = sent_at.replace(tzinfo=timezone.utc)
+    return sent_at.astimezone(tz).date()
+
+def reservation_delta(reservation: Reservation, sign: int = 1) -> Dict[str, Any]:
+    """Rollup change for adding (sign=1) or removing (sign=-1) an active reservation"""
+    return {
+        "day": reservation.visit_date.date(),
+        "metric": RESERVATIONS,
+        "vaccine_type": reservation.vaccine_type or "",
+        "created_by": reservation.created_by or 0,
+        "sms_type": "",
+        "status": "",
+        "count": sign,
+        "cost": 0
+    }
+
+def sms_delta(row, sign: int = 1) -> Dict[str, Any]:
+    """Rollup change for an SMS archive row, given as a dict of values or an SMSArchive"""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    return {
+        "day": sms_day(get("sent_at")),
+        "metric": SMS,
+        "vaccine_type": "",
+        "created_by": get("sent_by") or 0,
+        "sms_type": get("sms_type") or "manual",
+        "status": get("status") or "sent",
+        "count": sign,
+        "cost": sign * (get("cost") or 0)
+    }
+
+def _merge(deltas: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sum deltas per rollup key and drop the ones that cancel out"""
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for delta in deltas:
+        key = tuple(delta[column] for column in KEY_COLUMNS)
+        if key in merged:
+            merged[key]["count"] += delta["count"]
+            merged[key]["cost"] += delta["cost"]
+        else:
+            merged[key] = dict(delta)
+    return [row for row in merged.values() if row["count"] or row["cost"]]
+
+def _upsert(rows: List[Dict[str, Any]], dialect: str = "postgresql"):
+    """INSERT ... ON CONFLICT adding the deltas to existing rollup rows (PostgreSQL or SQLite)"""
+    insert_ = sqlite_insert if dialect == "sqlite" else pg_insert
+    stmt = insert_(DailyMetric).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={
+            "count": DailyMetric.count + stmt.excluded.count,
+            "cost": DailyMetric.cost + stmt.excluded.cost
+        }
+    )
+
+class DailyMetricCRUD:
+    def apply(self, db: Session, deltas: Iterable[Dict[str, Any]]) -> None:
+        """Add deltas to the rollup in the caller's transaction (caller commits)"""
+        rows = _merge(deltas)
+        if rows:
+            db.execute(_upsert(rows, db.get_bind().dialect.name))
+    
+    async def apply_async(self, db: AsyncSession, deltas: Iterable[Dict[str, Any]]) -> None:
+        """Add deltas to the rollup in the caller's transaction (AsyncSession)"""
+        rows = _merge(deltas)
+        if rows:
+            await db.execute(_upsert(rows, db.get_bind().dialect.name))
+    
+    def rebuild(self, db: Session) -> int:
+        """Recompute every rollup row from reservations and sms_archive, returns rows written"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            self._rebuild_sqlite(db)
+        elif dialect == "postgresql":
+            self._rebuild_postgresql(db)
+        else:
+            raise ValueError(f"Rebuilding daily_metrics is not supported on {dialect}")
+        
+        db.commit()
+        return db.scalar(select(func.count()).select_from(DailyMetric)) or 0
+    
+    def _rebuild_postgresql(self, db: Session) -> None:
+        # Concurrent writers queue their deltas behind the lock and apply them after the rebuild
+        db.execute(text("LOCK TABLE daily_metrics IN EXCLUSIVE MODE"))
+        db.execute(delete(DailyMetric))
+        
+        visit_day = cast(Reservation.visit_date, Date)
+        db.execute(insert(DailyMetric).from_select(
+            [*KEY_COLUMNS, "count", "cost"],
+            select(
+                visit_day,
+                literal(RESERVATIONS),
+                Reservation.vaccine_type,
+                Reservation.created_by,
+                literal(""),
+                literal(""),
+                func.count(),
+                literal(0)
+            ).where(
+                Reservation.is_active == True
+            ).group_by(visit_day, Reservation.vaccine_type, Reservation.created_by)
+        ))
+        
+        sent_day = cast(func.timezone(settings.METRICS_TIMEZONE, SMSArchive.sent_at), Date)
+        db.execute(insert(DailyMetric).from_select(
+            [*KEY_COLUMNS, "count", "cost"],
+            select(
+                sent_day,
+                literal(SMS),
+                literal(""),
+                SMSArchive.sent_by,
+                SMSArchive.sms_type,
+                SMSArchive.status,
+                func.count(),
+                func.coalesce(func.sum(SMSArchive.cost), 0)
+            ).group_by(sent_day, SMSArchive.sent_by, SMSArchive.sms_type, SMSArchive.status)
+        ))
+    
+    def _rebuild_sqlite(self, db: Session) -> None:
+        # No LOCK TABLE or timezone() here: the delete takes SQLite's database write
+        # lock until commit, and rows are summed with the deltas the write paths use
+        db.execute(delete(DailyMetric))
+        
+        reservations = db.execute(
+            select(Reservation.visit_date, Reservation.vaccine_type, Reservation.created_by)
+            .where(Reservation.is_active == True)
+            .execution_options(yield_per=1000)
+        )
+        messages = db.execute(
+            select(SMSArchive.sent_at, SMSArchive.sent_by, SMSArchive.sms_type, SMSArchive.status, SMSArchive.cost)
+            .execution_options(yield_per=1000)
+        )
+        rows = _merge(chain(
+            (reservation_delta(row) for row in reservations),
+            (sms_delta(row) for row in messages)
+        ))
+        
+        for start in range(0, len(rows), SQLITE_REBUILD_CHUNK):
+            db.execute(_upsert(rows[start:start + SQLITE_REBUILD_CHUNK], "sqlite"))
+
+daily_metric_crud = DailyMetricCRUD()
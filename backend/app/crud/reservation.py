@@ -1,10 +1,133 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, and_, func, select, update, literal_column, exists
 from typing import Optional, List, Tuple
-from datetime import datetime, timedelta
+import re
+from datetime import datetime, timedelta, time, timezone
+from app.core.cache import TTLCache, invalidate_on_write
+from app.core.config import settings
+from app.core.pagination import keyset_before, count_rows, count_cache_key
+from app.core.phone import normalize_phone
+from app.crud.daily_metric import daily_metric_crud, reservation_delta, RESERVATIONS
+from app.models.daily_metric import DailyMetric
 from app.models.reservation import Reservation
+from app.models.sms_archive import SMSArchive
 from app.schemas.reservation import ReservationCreate, ReservationUpdate, ReservationFilter
 
+# Characters with meaning in tsquery syntax, stripped from user search terms
+TSQUERY_SPECIAL_CHARS = re.compile(r"[&|!():*<>'\\]")
+ARABIC_TO_PERSIAN = str.maketrans("يك", "یک")
+
+# Dashboard statistics, dropped whenever reservations are written
+statistics_cache = invalidate_on_write(TTLCache(maxsize=16, ttl=settings.STATISTICS_CACHE_TTL))
+STATISTICS_CACHE_KEY = (Reservation.__tablename__, "statistics")
+
+# Generated column created by SEARCH_VECTOR_DDL, not mapped on the model
+search_vector = literal_column("reservations.search_vector")
+
+def _search_query(search: str):
+    """Build a prefix tsquery (every word must match) or None if no words remain"""
+    words = TSQUERY_SPECIAL_CHARS.sub(" ", search.translate(ARABIC_TO_PERSIAN)).split()
+    if not words:
+        return None
+    return func.to_tsquery("simple", " & ".join(f"{word}:*" for word in words))
+
+def _filter_conditions(filters: ReservationFilter, dialect: str = "postgresql") -> list:
+    """Build WHERE conditions for a reservation filter"""
+    conditions = [Reservation.is_active == True]
+    
+    if filters.search:
+        ts_query = _search_query(filters.search) if dialect == "postgresql" else None
+        if ts_query is not None:
+            conditions.append(search_vector.op("@@")(ts_query))
+        else:
+            search_term = f"%{filters.search}%"
+            conditions.append(
+                or_(
+                    Reservation.pet_name.ilike(search_term),
+                    Reservation.owner_name.ilike(search_term),
+                    Reservation.vaccine_type.ilike(search_term),
+                    Reservation.notes.ilike(search_term)
+                )
+            )
+    
+    if filters.owner_name:
+        conditions.append(Reservation.owner_name.ilike(f"%{filters.owner_name}%"))
+    
+    if filters.pet_name:
+        conditions.append(Reservation.pet_name.ilike(f"%{filters.pet_name}%"))
+    
+    if filters.vaccine_type:
+        conditions.append(Reservation.vaccine_type.ilike(f"%{filters.vaccine_type}%"))
+    
+    if filters.visit_date_from:
+        conditions.append(Reservation.visit_date >= filters.visit_date_from)
+    
+    if filters.visit_date_to:
+        conditions.append(Reservation.visit_date <= filters.visit_date_to)
+    
+    if filters.next_visit_date_from:
+        conditions.append(Reservation.next_visit_date >= filters.next_visit_date_from)
+    
+    if filters.next_visit_date_to:
+        conditions.append(Reservation.next_visit_date <= filters.next_visit_date_to)
+    
+    if filters.reminder_sent is not None:
+        conditions.append(Reservation.reminder_sent == filters.reminder_sent)
+    
+    return conditions
+
+def _ordering(filters: ReservationFilter, dialect: str = "postgresql") -> list:
+    """ORDER BY for a reservation filter: best search matches first, then newest"""
+    order = [Reservation.created_at.desc(), Reservation.id.desc()]
+    
+    if filters.search and dialect == "postgresql":
+        ts_query = _search_query(filters.search)
+        if ts_query is not None:
+            order.insert(0, func.ts_rank(search_vector, ts_query).desc())
+    
+    return order
+
+def _paginate(query, filters: ReservationFilter, dialect: str = "postgresql"):
+    """Apply keyset pagination when filters.after is set, page numbers otherwise"""
+    if filters.after:
+        # Keyset mode walks the (created_at, id) index and ignores search ranking
+        condition, order = keyset_before(Reservation.created_at, Reservation.id, filters.after, dialect)
+        return query.filter(condition).order_by(*order).limit(filters.size)
+    
+    return query.order_by(*_ordering(filters, dialect)).offset(
+        (filters.page - 1) * filters.size
+    ).limit(filters.size)
+
+def _statistics_query():
+    """All reservation statistics in one round trip: visit-date counts from the
+    daily_metrics rollup, pending reminders from the next_visit_date index"""
+    now = datetime.now()
+    today = now.date()
+    week_start = today - timedelta(days=today.weekday())
+    week_end = week_start + timedelta(days=7)
+    month_start = today.replace(day=1)
+    
+    pending_reminders = select(func.count()).select_from(Reservation).where(
+        Reservation.is_active == True,
+        Reservation.next_visit_date >= now,
+        Reservation.reminder_sent == False
+    ).scalar_subquery()
+    
+    def total(*conditions):
+        reservations = func.sum(DailyMetric.count)
+        if conditions:
+            reservations = reservations.filter(*conditions)
+        return func.coalesce(reservations, 0)
+    
+    return select(
+        total().label("total_reservations"),
+        total(DailyMetric.day == today).label("today_reservations"),
+        total(DailyMetric.day >= week_start, DailyMetric.day < week_end).label("week_reservations"),
+        total(DailyMetric.day >= month_start).label("month_reservations"),
+        pending_reminders.label("pending_reminders")
+    ).where(DailyMetric.metric == RESERVATIONS)
+
 class ReservationCRUD:
     def get(self, db: Session, reservation_id: int) -> Optional[Reservation]:
         """Get reservation by ID"""
@@ -20,6 +143,7 @@ class ReservationCRUD:
             created_by=created_by
         )
         db.add(db_reservation)
+        daily_metric_crud.apply(db, [reservation_delta(db_reservation)])
         db.commit()
         db.refresh(db_reservation)
         return db_reservation
@@ -32,9 +156,16 @@ class ReservationCRUD:
         
         update_data = reservation_in.dict(exclude_unset=True)
         
+        # Move the reservation between rollup rows if its day, vaccine or state changed
+        deltas = [reservation_delta(db_reservation, -1)]
+        
         for field, value in update_data.items():
             setattr(db_reservation, field, value)
         
+        if db_reservation.is_active:
+            deltas.append(reservation_delta(db_reservation))
+        daily_metric_crud.apply(db, deltas)
+        
         db.commit()
         db.refresh(db_reservation)
         return db_reservation
@@ -46,63 +177,10 @@ class ReservationCRUD:
             return False
         
         db_reservation.is_active = False
+        daily_metric_crud.apply(db, [reservation_delta(db_reservation, -1)])
         db.commit()
         return True
     
-    def get_multi_filtered(
-        self, 
-        db: Session, 
-        filters: ReservationFilter
-    ) -> Tuple[List[Reservation], int]:
-        """Get reservations with filters and pagination"""
-        query = db.query(Reservation).filter(Reservation.is_active == True)
-        
-        # Apply filters
-        if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.filter(
-                or_(
-                    Reservation.pet_name.ilike(search_term),
-                    Reservation.owner_name.ilike(search_term),
-                    Reservation.vaccine_type.ilike(search_term),
-                    Reservation.notes.ilike(search_term)
-                )
-            )
-        
-        if filters.owner_name:
-            query = query.filter(Reservation.owner_name.ilike(f"%{filters.owner_name}%"))
-        
-        if filters.pet_name:
-            query = query.filter(Reservation.pet_name.ilike(f"%{filters.pet_name}%"))
-        
-        if filters.vaccine_type:
-            query = query.filter(Reservation.vaccine_type.ilike(f"%{filters.vaccine_type}%"))
-        
-        if filters.visit_date_from:
-            query = query.filter(Reservation.visit_date >= filters.visit_date_from)
-        
-        if filters.visit_date_to:
-            query = query.filter(Reservation.visit_date <= filters.visit_date_to)
-        
-        if filters.next_visit_date_from:
-            query = query.filter(Reservation.next_visit_date >= filters.next_visit_date_from)
-        
-        if filters.next_visit_date_to:
-            query = query.filter(Reservation.next_visit_date <= filters.next_visit_date_to)
-        
-        if filters.reminder_sent is not None:
-            query = query.filter(Reservation.reminder_sent == filters.reminder_sent)
-        
-        # Get total count
-        total = query.count()
-        
-        # Apply pagination and ordering
-        reservations = query.order_by(Reservation.created_at.desc()).offset(
-            (filters.page - 1) * filters.size
-        ).limit(filters.size).all()
-        
-        return reservations, total
-    
     def get_upcoming_appointments(self, db: Session, days_ahead: int = 7) -> List[Reservation]:
         """Get upcoming appointments within specified days"""
         end_date = datetime.now() + timedelta(days=days_ahead)
@@ -123,6 +201,51 @@ class ReservationCRUD:
             Reservation.reminder_sent == False
         ).all()
     
+    def claim_due_reminders(
+        self, 
+        db: Session, 
+        days_before: int = 1, 
+        limit: int = 500,
+        exclude_ids: Optional[List[int]] = None
+    ) -> List[Reservation]:
+        """Lock a batch of due reminders, skipping rows locked by other workers
+        
+        Reminders that failed are retried after REMINDER_RETRY_DELAY seconds, at
+        most REMINDER_MAX_ATTEMPTS times; the failed auto_reminder archive rows
+        are the attempt history. A failure the provider may have accepted
+        (maybe_sent) is never retried, so it can't reach the owner twice.
+        """
+        now = datetime.now()
+        window_end = datetime.combine(now.date() + timedelta(days=days_before + 1), time.min)
+        
+        failed_reminder = and_(
+            SMSArchive.reservation_id == Reservation.id,
+            SMSArchive.sms_type == "auto_reminder",
+            SMSArchive.status == "failed"
+        )
+        maybe_sent = exists().where(failed_reminder, SMSArchive.maybe_sent == True).correlate(Reservation)
+        failed_attempts = select(func.count()).where(failed_reminder).correlate(Reservation).scalar_subquery()
+        failed_recently = exists().where(
+            failed_reminder,
+            SMSArchive.sent_at >= datetime.now(timezone.utc) - timedelta(seconds=settings.REMINDER_RETRY_DELAY)
+        ).correlate(Reservation)
+        
+        query = db.query(Reservation).filter(
+            Reservation.is_active == True,
+            Reservation.reminder_sent == False,
+            Reservation.next_visit_date >= now,
+            Reservation.next_visit_date < window_end,
+            ~maybe_sent,
+            ~failed_recently,
+            failed_attempts < settings.REMINDER_MAX_ATTEMPTS
+        )
+        if exclude_ids:
+            query = query.filter(Reservation.id.notin_(exclude_ids))
+        
+        return query.order_by(Reservation.next_visit_date).limit(limit).with_for_update(
+            skip_locked=True
+        ).all()
+    
     def mark_reminder_sent(self, db: Session, reservation_id: int) -> bool:
         """Mark reminder as sent"""
         db_reservation = self.get(db, reservation_id)
@@ -134,53 +257,185 @@ class ReservationCRUD:
         return True
     
     def get_statistics(self, db: Session) -> dict:
-        """Get reservation statistics"""
-        total_reservations = db.query(Reservation).filter(Reservation.is_active == True).count()
-        
-        today = datetime.now().date()
-        today_reservations = db.query(Reservation).filter(
+        """Get reservation statistics (cached for STATISTICS_CACHE_TTL seconds)"""
+        stats = statistics_cache.get(STATISTICS_CACHE_KEY)
+        if stats is None:
+            stats = dict(db.execute(_statistics_query()).mappings().one())
+            statistics_cache.set(STATISTICS_CACHE_KEY, stats)
+        return stats
+    
+    def get_by_phone(self, db: Session, phone_number: str) -> List[Reservation]:
+        """Get reservations by phone number (any format)"""
+        return db.query(Reservation).filter(
             Reservation.is_active == True,
-            func.date(Reservation.visit_date) == today
-        ).count()
+            Reservation.phone_normalized == normalize_phone(phone_number)
+        ).order_by(Reservation.created_at.desc()).all()
+    
+    def backfill_phone_normalized(self, db: Session, batch_size: int = 1000) -> int:
+        """Fill phone_normalized for rows created before the column existed"""
+        updated = 0
+        last_id = 0
         
-        # This week
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
-        week_reservations = db.query(Reservation).filter(
-            Reservation.is_active == True,
-            func.date(Reservation.visit_date) >= week_start,
-            func.date(Reservation.visit_date) <= week_end
-        ).count()
+        while True:
+            rows = db.query(Reservation.id, Reservation.phone_number).filter(
+                Reservation.phone_normalized.is_(None),
+                Reservation.id > last_id
+            ).order_by(Reservation.id).limit(batch_size).all()
+            
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            changes = [
+                {"id": row.id, "phone_normalized": normalize_phone(row.phone_number) or None}
+                for row in rows
+            ]
+            db.execute(update(Reservation), changes)
+            db.commit()
+            updated += len(changes)
         
-        # This month
-        month_start = today.replace(day=1)
-        month_reservations = db.query(Reservation).filter(
-            Reservation.is_active == True,
-            func.date(Reservation.visit_date) >= month_start
-        ).count()
+        return updated
+
+class AsyncReservationCRUD:
+    async def get(self, db: AsyncSession, reservation_id: int) -> Optional[Reservation]:
+        """Get reservation by ID"""
+        result = await db.execute(
+            select(Reservation).where(
+                Reservation.id == reservation_id,
+                Reservation.is_active == True
+            )
+        )
+        return result.scalars().first()
+    
+    async def create(self, db: AsyncSession, reservation_in: ReservationCreate, created_by: int) -> Reservation:
+        """Create new reservation"""
+        db_reservation = Reservation(
+            **reservation_in.dict(),
+            created_by=created_by
+        )
+        db.add(db_reservation)
+        await daily_metric_crud.apply_async(db, [reservation_delta(db_reservation)])
+        await db.commit()
+        await db.refresh(db_reservation)
+        return db_reservation
+    
+    async def update(self, db: AsyncSession, reservation_id: int, reservation_in: ReservationUpdate) -> Optional[Reservation]:
+        """Update reservation"""
+        db_reservation = await self.get(db, reservation_id)
+        if not db_reservation:
+            return None
         
-        # Pending reminders
-        pending_reminders = db.query(Reservation).filter(
-            Reservation.is_active == True,
-            Reservation.next_visit_date.isnot(None),
-            Reservation.next_visit_date >= datetime.now(),
-            Reservation.reminder_sent == False
-        ).count()
+        update_data = reservation_in.dict(exclude_unset=True)
+        
+        # Move the reservation between rollup rows if its day, vaccine or state changed
+        deltas = [reservation_delta(db_reservation, -1)]
+        
+        for field, value in update_data.items():
+            setattr(db_reservation, field, value)
+        
+        if db_reservation.is_active:
+            deltas.append(reservation_delta(db_reservation))
+        await daily_metric_crud.apply_async(db, deltas)
         
-        return {
-            "total_reservations": total_reservations,
-            "today_reservations": today_reservations,
-            "week_reservations": week_reservations,
-            "month_reservations": month_reservations,
-            "pending_reminders": pending_reminders
-        }
+        await db.commit()
+        await db.refresh(db_reservation)
+        return db_reservation
     
-    def get_by_phone(self, db: Session, phone_number: str) -> List[Reservation]:
-        """Get reservations by phone number"""
-        return db.query(Reservation).filter(
-            Reservation.is_active == True,
-            Reservation.phone_number == phone_number
-        ).order_by(Reservation.created_at.desc()).all()
+    async def delete(self, db: AsyncSession, reservation_id: int) -> bool:
+        """Delete reservation (soft delete)"""
+        db_reservation = await self.get(db, reservation_id)
+        if not db_reservation:
+            return False
+        
+        db_reservation.is_active = False
+        await daily_metric_crud.apply_async(db, [reservation_delta(db_reservation, -1)])
+        await db.commit()
+        return True
+    
+    async def get_multi_filtered(
+        self, 
+        db: AsyncSession, 
+        filters: ReservationFilter
+    ) -> Tuple[List[Reservation], int, bool]:
+        """Get reservations with filters and page-number or cursor pagination
+        
+        Returns (reservations, total, total_is_exact); filters.count picks the count mode.
+        """
+        dialect = db.get_bind().dialect.name
+        conditions = _filter_conditions(filters, dialect)
+        
+        # Get total count
+        total, total_exact = await count_rows(
+            db,
+            Reservation.__table__,
+            conditions,
+            mode=filters.count,
+            cache_key=count_cache_key(Reservation.__tablename__, filters.dict()),
+            unfiltered=len(conditions) == 1
+        )
+        
+        # Apply pagination and ordering
+        result = await db.execute(
+            _paginate(select(Reservation).where(*conditions), filters, dialect)
+        )
+        
+        return list(result.scalars().all()), total, total_exact
+    
+    async def get_upcoming_appointments(self, db: AsyncSession, days_ahead: int = 7) -> List[Reservation]:
+        """Get upcoming appointments within specified days"""
+        end_date = datetime.now() + timedelta(days=days_ahead)
+        result = await db.execute(
+            select(Reservation).where(
+                Reservation.is_active == True,
+                Reservation.next_visit_date >= datetime.now(),
+                Reservation.next_visit_date <= end_date,
+                Reservation.reminder_sent == False
+            )
+        )
+        return list(result.scalars().all())
+    
+    async def get_pending_reminders(self, db: AsyncSession, days_before: int = 1) -> List[Reservation]:
+        """Get reservations that need reminder SMS"""
+        target_date = datetime.now() + timedelta(days=days_before)
+        result = await db.execute(
+            select(Reservation).where(
+                Reservation.is_active == True,
+                Reservation.next_visit_date.isnot(None),
+                func.date(Reservation.next_visit_date) == target_date.date(),
+                Reservation.reminder_sent == False
+            )
+        )
+        return list(result.scalars().all())
+    
+    async def mark_reminder_sent(self, db: AsyncSession, reservation_id: int) -> bool:
+        """Mark reminder as sent"""
+        db_reservation = await self.get(db, reservation_id)
+        if not db_reservation:
+            return False
+        
+        db_reservation.reminder_sent = True
+        await db.commit()
+        return True
+    
+    async def get_statistics(self, db: AsyncSession) -> dict:
+        """Get reservation statistics (cached for STATISTICS_CACHE_TTL seconds)"""
+        stats = statistics_cache.get(STATISTICS_CACHE_KEY)
+        if stats is None:
+            result = await db.execute(_statistics_query())
+            stats = dict(result.mappings().one())
+            statistics_cache.set(STATISTICS_CACHE_KEY, stats)
+        return stats
+    
+    async def get_by_phone(self, db: AsyncSession, phone_number: str) -> List[Reservation]:
+        """Get reservations by phone number (any format)"""
+        result = await db.execute(
+            select(Reservation).where(
+                Reservation.is_active == True,
+                Reservation.phone_normalized == normalize_phone(phone_number)
+            ).order_by(Reservation.created_at.desc())
+        )
+        return list(result.scalars().all())
 
-# Create instance
-reservation_crud = ReservationCRUD()
\ No newline at end of file
+# Create instances
+reservation_crud = ReservationCRUD()
+async_reservation_crud = AsyncReservationCRUD()
\ No newline at end of file
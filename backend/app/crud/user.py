@@ -1,9 +1,17 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select, func
+from typing import Optional, Dict
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserCreateOAuth
-from app.core.security import get_password_hash, verify_password
+from app.core.security import (
+    get_password_hash, verify_password, get_password_hash_async, verify_password_async
+)
+from app.services.user_cache import user_auth_cache
+from app.services.token_epochs import token_epochs
+
+# Changing these revokes the user's outstanding tokens
+REVOKING_FIELDS = {"is_active", "is_superuser", "password"}
 
 class UserCRUD:
     def get(self, db: Session, user_id: int) -> Optional[User]:
@@ -56,6 +64,7 @@ class UserCRUD:
             return None
         
         update_data = user_in.dict(exclude_unset=True)
+        revoke_tokens = not REVOKING_FIELDS.isdisjoint(update_data)
         
         # Hash password if provided
         if "password" in update_data:
@@ -65,6 +74,9 @@ class UserCRUD:
             setattr(db_user, field, value)
         
         db.commit()
+        user_auth_cache.invalidate_sync(user_id)
+        if revoke_tokens:
+            token_epochs.bump_sync(user_id)
         db.refresh(db_user)
         return db_user
     
@@ -93,6 +105,8 @@ class UserCRUD:
         
         db_user.is_active = False
         db.commit()
+        user_auth_cache.invalidate_sync(user_id)
+        token_epochs.bump_sync(user_id)
         return True
     
     def get_multi(self, db: Session, skip: int = 0, limit: int = 100) -> list[User]:
@@ -108,6 +122,147 @@ class UserCRUD:
                 User.email.ilike(f"%{query}%")
             )
         ).offset(skip).limit(limit).all()
+    
+    def count(self, db: Session) -> Dict[str, int]:
+        """Count users by state in one aggregate query (inactive users included)"""
+        row = db.query(
+            func.count().label("total_users"),
+            func.count().filter(User.is_active == True).label("active_users"),
+            func.count(User.google_id).label("oauth_users")
+        ).one()
+        
+        return {
+            "total_users": row.total_users,
+            "active_users": row.active_users,
+            "inactive_users": row.total_users - row.active_users,
+            "oauth_users": row.oauth_users,
+            "regular_users": row.total_users - row.oauth_users
+        }
+
+class AsyncUserCRUD:
+    async def get(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        """Get user by ID"""
+        return await db.get(User, user_id)
+    
+    async def get_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
+        """Get user by email"""
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+    
+    async def get_by_google_id(self, db: AsyncSession, google_id: str) -> Optional[User]:
+        """Get user by Google ID"""
+        result = await db.execute(select(User).where(User.google_id == google_id))
+        return result.scalars().first()
+    
+    async def create(self, db: AsyncSession, user_in: UserCreate) -> User:
+        """Create new user"""
+        hashed_password = await get_password_hash_async(user_in.password)
+        db_user = User(
+            email=user_in.email,
+            full_name=user_in.full_name,
+            hashed_password=hashed_password,
+            is_active=user_in.is_active,
+            is_superuser=user_in.is_superuser
+        )
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+    
+    async def create_oauth(self, db: AsyncSession, user_in: UserCreateOAuth) -> User:
+        """Create OAuth user"""
+        db_user = User(
+            email=user_in.email,
+            full_name=user_in.full_name,
+            google_id=user_in.google_id,
+            oauth_provider=user_in.oauth_provider,
+            profile_picture=user_in.profile_picture,
+            is_active=True,
+            is_superuser=False
+        )
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+    
+    async def update(self, db: AsyncSession, user_id: int, user_in: UserUpdate) -> Optional[User]:
+        """Update user"""
+        db_user = await self.get(db, user_id)
+        if not db_user:
+            return None
+        
+        update_data = user_in.dict(exclude_unset=True)
+        revoke_tokens = not REVOKING_FIELDS.isdisjoint(update_data)
+        
+        # Hash password if provided
+        if "password" in update_data:
+            update_data["hashed_password"] = await get_password_hash_async(update_data.pop("password"))
+        
+        for field, value in update_data.items():
+            setattr(db_user, field, value)
+        
+        await db.commit()
+        await user_auth_cache.invalidate(user_id)
+        if revoke_tokens:
+            await token_epochs.bump(user_id)
+        await db.refresh(db_user)
+        return db_user
+    
+    async def authenticate(self, db: AsyncSession, email: str, password: str) -> Optional[User]:
+        """Authenticate user, rehashing the password if BCRYPT_ROUNDS changed"""
+        user = await self.get_by_email(db, email)
+        if not user or not user.hashed_password:
+            return None
+        
+        valid, new_hash = await verify_password_async(password, user.hashed_password)
+        if not valid:
+            return None
+        
+        if new_hash:
+            user.hashed_password = new_hash
+            await db.commit()
+        return user
+    
+    def is_active(self, user: User) -> bool:
+        """Check if user is active"""
+        return user.is_active
+    
+    def is_superuser(self, user: User) -> bool:
+        """Check if user is superuser"""
+        return user.is_superuser
+    
+    async def delete(self, db: AsyncSession, user_id: int) -> bool:
+        """Delete user (soft delete by setting is_active=False)"""
+        db_user = await self.get(db, user_id)
+        if not db_user:
+            return False
+        
+        db_user.is_active = False
+        await db.commit()
+        await user_auth_cache.invalidate(user_id)
+        await token_epochs.bump(user_id)
+        return True
+    
+    async def get_multi(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> list[User]:
+        """Get multiple users"""
+        result = await db.execute(
+            select(User).where(User.is_active == True).offset(skip).limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def search(self, db: AsyncSession, query: str, skip: int = 0, limit: int = 100) -> list[User]:
+        """Search users by name or email"""
+        result = await db.execute(
+            select(User).where(
+                User.is_active == True,
+                or_(
+                    User.full_name.ilike(f"%{query}%"),
+                    User.email.ilike(f"%{query}%")
+                )
+            ).offset(skip).limit(limit)
+        )
+        return list(result.scalars().all())
 
-# Create instance
-user_crud = UserCRUD()
\ No newline at end of file
+# Create instances
+user_crud = UserCRUD()
+async_user_crud = AsyncUserCRUD()
\ No newline at end of file
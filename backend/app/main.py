@@ -5,8 +5,14 @@ from fastapi.responses import FileResponse
 import os
 
 from app.core.config import settings
-from app.core.database import engine
-from app.models import User, Reservation, SMSArchive
+from app.core.database import engine, async_engine
+from app.core.loop_monitor import install_loop_monitor
+from app.core.metrics import install_metrics
+from app.core.query_profiler import install_query_profiler
+from app.services.sms_service import sms_service
+from app.services.user_cache import user_auth_cache
+from app.services.token_epochs import token_epochs
+from app.models import User, Reservation, SMSArchive, DailyMetric
 
 # Import API routers
 from app.api.auth import router as auth_router
@@ -18,6 +24,7 @@ from app.api.sms import router as sms_router
 User.metadata.create_all(bind=engine)
 Reservation.metadata.create_all(bind=engine)
 SMSArchive.metadata.create_all(bind=engine)
+DailyMetric.metadata.create_all(bind=engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -70,6 +77,28 @@ app.include_router(
     tags=["SMS"]
 )
 
+# Prometheus metrics
+install_metrics(app)
+
+# Opt-in per-request SQL profiler
+install_query_profiler(app)
+
+# Opt-in event-loop lag monitor
+install_loop_monitor(app)
+
+# Listen for user cache invalidations from other workers
+@app.on_event("startup")
+async def startup_event():
+    user_auth_cache.start()
+
+# Close pooled async DB and SMS provider connections on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    await user_auth_cache.close()
+    await token_epochs.close()
+    await sms_service.close()
+    await async_engine.dispose()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -1,5 +1,6 @@
 from .user import User
 from .reservation import Reservation
 from .sms_archive import SMSArchive
+from .daily_metric import DailyMetric
 
-__all__ = ["User", "Reservation", "SMSArchive"]
\ No newline at end of file
+__all__ = ["User", "Reservation", "SMSArchive", "DailyMetric"]
\ No newline at end of file
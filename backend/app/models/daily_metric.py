@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Date, UniqueConstraint
+from app.core.database import Base
+
+class DailyMetric(Base):
+    """Per-day rollup of reservations and SMS, maintained by app.crud.daily_metrics"""
+    
+    __tablename__ = "daily_metrics"
+    
+    id = Column(Integer, primary_key=True)
+    
+    day = Column(Date, nullable=False, index=True)
+    metric = Column(String(20), nullable=False)  # reservations, sms
+    
+    # Dimensions, "" / 0 where they don't apply to the metric
+    vaccine_type = Column(String(255), nullable=False, default="")
+    created_by = Column(Integer, nullable=False, default=0)  # reservation creator / SMS sender
+    sms_type = Column(String(50), nullable=False, default="")
+    status = Column(String(50), nullable=False, default="")
+    
+    # Values
+    count = Column(Integer, nullable=False, default=0)
+    cost = Column(BigInteger, nullable=False, default=0)  # در ریال
+    
+    __table_args__ = (
+        UniqueConstraint(
+            "day", "metric", "vaccine_type", "created_by", "sms_type", "status",
+            name="uq_daily_metrics_key"
+        ),
+    )
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Numeric
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Numeric, DDL, event, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.core.phone import normalize_phone
 
 class Reservation(Base):
     __tablename__ = "reservations"
@@ -17,6 +18,7 @@ class Reservation(Base):
     # Owner information
     owner_name = Column(String(255), nullable=False, index=True)
     phone_number = Column(String(20), nullable=False)
+    phone_normalized = Column(String(20), nullable=True, index=True)  # E.164, kept in sync with phone_number
     
     # Appointment information
     visit_date = Column(DateTime, nullable=False, index=True)
@@ -40,4 +42,41 @@ class Reservation(Base):
     
     # Relationships
     created_by_user = relationship("User", back_populates="reservations")
-    sms_records = relationship("SMSArchive", back_populates="reservation")
\ No newline at end of file
+    sms_records = relationship("SMSArchive", back_populates="reservation")
+    
+    __table_args__ = (
+        # Keyset pagination order
+        Index("ix_reservations_created_at_id", "created_at", "id"),
+    )
+    
+    @validates("phone_number")
+    def _normalize_phone_number(self, key, phone_number):
+        self.phone_normalized = normalize_phone(phone_number) or None
+        return phone_number
+
+# Full-text search (PostgreSQL only): a generated, weighted tsvector with a GIN
+# index. The "simple" config has no stemming, so Persian words index as-is;
+# Arabic ي/ك are folded into Persian ی/ک on both sides.
+SEARCH_VECTOR_COLUMN_DDL = """
+    ALTER TABLE reservations ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', translate(coalesce(pet_name, '') || ' ' || coalesce(owner_name, ''), 'يك', 'یک')), 'A') ||
+        setweight(to_tsvector('simple', translate(coalesce(vaccine_type, ''), 'يك', 'یک')), 'B') ||
+        setweight(to_tsvector('simple', translate(coalesce(notes, ''), 'يك', 'یک')), 'C')
+    ) STORED
+"""
+SEARCH_INDEX_DDL = "CREATE INDEX {concurrently}IF NOT EXISTS ix_reservations_search_vector ON reservations USING GIN (search_vector)"
+
+# Run right after CREATE TABLE, on an empty table, so a plain CREATE INDEX is
+# fine here; app.scripts.create_search_index builds it CONCURRENTLY instead.
+SEARCH_VECTOR_DDL = [
+    SEARCH_VECTOR_COLUMN_DDL,
+    SEARCH_INDEX_DDL.format(concurrently="")
+]
+
+for statement in SEARCH_VECTOR_DDL:
+    event.listen(
+        Reservation.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql")
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -22,6 +22,12 @@ class SMSArchive(Base):
     provider_status = Column(String(100), nullable=True)
     cost = Column(Integer, nullable=True)  # در ریال
     
+    # Outbox delivery state
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)  # also the worker lease
+    last_error = Column(Text, nullable=True)
+    maybe_sent = Column(Boolean, nullable=False, default=False, server_default=text("false"))  # failed, but the provider may have accepted it
+    
     # Relations
     reservation_id = Column(Integer, ForeignKey("reservations.id"), nullable=True)
     sent_by = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -32,4 +38,20 @@ class SMSArchive(Base):
     
     # Relationships
     reservation = relationship("Reservation", back_populates="sms_records")
-    sent_by_user = relationship("User", back_populates="sms_archive")
\ No newline at end of file
+    sent_by_user = relationship("User", back_populates="sms_archive")
+    
+    __table_args__ = (
+        Index("ix_sms_archive_outbox", "status", "next_attempt_at"),
+        # Failed reminder attempts per reservation, for claim_due_reminders
+        Index(
+            "ix_sms_archive_failed_reminders", "reservation_id", "sent_at",
+            postgresql_where=text("status = 'failed' AND sms_type = 'auto_reminder'")
+        ),
+        # Keyset pagination order
+        Index("ix_sms_archive_sent_at_id", "sent_at", "id"),
+        # Rows still waiting for a delivery report
+        Index(
+            "ix_sms_archive_undelivered", "id",
+            postgresql_where=text("delivered_at IS NULL AND provider_message_id IS NOT NULL")
+        ),
+    )
\ No newline at end of file
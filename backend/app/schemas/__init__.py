@@ -5,7 +5,7 @@ from .sms import *
 __all__ = [
     # User schemas
     "UserBase", "UserCreate", "UserCreateOAuth", "UserUpdate", "User", 
-    "UserLogin", "Token", "PasswordReset", "PasswordResetConfirm",
+    "UserLogin", "Token", "TokenRefresh", "PasswordReset", "PasswordResetConfirm",
     
     # Reservation schemas
     "ReservationBase", "ReservationCreate", "ReservationUpdate", "Reservation",
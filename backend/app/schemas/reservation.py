@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 from decimal import Decimal
+from app.core.pagination import COUNT_MODE_PATTERN
 
 # Base Reservation schema
 class ReservationBase(BaseModel):
@@ -56,6 +57,8 @@ class ReservationList(BaseModel):
     page: int
     size: int
     pages: int
+    total_exact: bool = True  # False for capped, estimated or cached totals
+    next_cursor: Optional[str] = None  # pass as ?after= for the next page; unset on ranked search pages
 
 # Schema for reservation search/filter
 class ReservationFilter(BaseModel):
@@ -70,4 +73,6 @@ class ReservationFilter(BaseModel):
     is_active: Optional[bool] = True
     reminder_sent: Optional[bool] = None
     page: int = Field(1, ge=1)
-    size: int = Field(10, ge=1, le=100)
\ No newline at end of file
+    size: int = Field(10, ge=1, le=100)
+    after: Optional[str] = None  # keyset cursor, overrides page
+    count: str = Field("exact", pattern=COUNT_MODE_PATTERN)
\ No newline at end of file
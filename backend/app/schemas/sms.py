@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
+from app.core.pagination import COUNT_MODE_PATTERN
 
 # Base SMS schema
 class SMSBase(BaseModel):
@@ -42,6 +43,8 @@ class SMSList(BaseModel):
     page: int
     size: int
     pages: int
+    total_exact: bool = True  # False for capped, estimated or cached totals
+    next_cursor: Optional[str] = None  # pass as ?after= for the next page
 
 # Schema for SMS search/filter
 class SMSFilter(BaseModel):
@@ -56,6 +59,8 @@ class SMSFilter(BaseModel):
     sent_date_to: Optional[datetime] = None
     page: int = Field(1, ge=1)
     size: int = Field(10, ge=1, le=100)
+    after: Optional[str] = None  # keyset cursor, overrides page
+    count: str = Field("exact", pattern=COUNT_MODE_PATTERN)
 
 # Schema for SMS statistics
 class SMSStats(BaseModel):
@@ -49,9 +49,14 @@ class UserLogin(BaseModel):
 # Schema for token response
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
+    expires_in: Optional[int] = None  # access token lifetime in seconds
     user: User
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 # Schema for password reset
 class PasswordReset(BaseModel):
     email: EmailStr
@@ -0,0 +1,51 @@
+"""Add the SMS outbox columns and index to an existing sms_archive table
+
+New databases get them from create_all (which only creates missing
+tables); run this once on existing ones before starting the new code:
+
+    python -m app.scripts.add_outbox_columns
+"""
+import logging
+
+from sqlalchemy import text
+
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    "attempts INTEGER NOT NULL DEFAULT 0",
+    "next_attempt_at TIMESTAMP WITH TIME ZONE",
+    "last_error TEXT",
+    "maybe_sent BOOLEAN NOT NULL DEFAULT false"
+]
+
+def ensure_columns():
+    """Add the outbox columns if they are missing"""
+    with engine.connect() as conn:
+        for column in COLUMNS:
+            conn.execute(text(f"ALTER TABLE sms_archive ADD COLUMN IF NOT EXISTS {column}"))
+        conn.commit()
+    logger.info("Outbox columns are ready")
+
+def ensure_index():
+    """Build ix_sms_archive_outbox without blocking writes"""
+    # CONCURRENTLY can't run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sms_archive_outbox "
+            "ON sms_archive (status, next_attempt_at)"
+        ))
+    logger.info("Index ix_sms_archive_outbox is ready")
+
+def main():
+    if engine.dialect.name != "postgresql":
+        logger.info("Outbox migration is PostgreSQL only, nothing to do")
+        return
+    
+    ensure_columns()
+    ensure_index()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
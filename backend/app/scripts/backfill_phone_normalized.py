@@ -0,0 +1,45 @@
+"""One-off backfill for reservations.phone_normalized
+
+Adds the column and its index on existing databases (create_all only
+creates missing tables), then normalizes every stored phone number:
+
+    python -m app.scripts.backfill_phone_normalized
+"""
+import logging
+
+from sqlalchemy import text
+
+from app.core.database import engine, SessionLocal
+from app.crud.reservation import reservation_crud
+
+logger = logging.getLogger(__name__)
+
+def ensure_column():
+    """Add phone_normalized and its index if they are missing (PostgreSQL)"""
+    with engine.connect() as conn:
+        conn.execute(text(
+            "ALTER TABLE reservations ADD COLUMN IF NOT EXISTS phone_normalized VARCHAR(20)"
+        ))
+        conn.commit()
+    
+    # CONCURRENTLY can't run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reservations_phone_normalized "
+            "ON reservations (phone_normalized)"
+        ))
+
+def main():
+    if engine.dialect.name == "postgresql":
+        ensure_column()
+    
+    db = SessionLocal()
+    try:
+        updated = reservation_crud.backfill_phone_normalized(db)
+        logger.info("Normalized %d phone numbers", updated)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
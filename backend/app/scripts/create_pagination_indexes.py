@@ -0,0 +1,30 @@
+"""Add the (created_at, id) / (sent_at, id) indexes used by cursor pagination
+
+New databases get them from create_all; run this once on existing ones:
+
+    python -m app.scripts.create_pagination_indexes
+"""
+import logging
+
+from app.core.database import engine
+from app.models.reservation import Reservation
+from app.models.sms_archive import SMSArchive
+
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    index
+    for table in (Reservation.__table__, SMSArchive.__table__)
+    for index in table.indexes
+    if index.name in ("ix_reservations_created_at_id", "ix_sms_archive_sent_at_id")
+]
+
+def main():
+    with engine.begin() as conn:
+        for index in INDEXES:
+            index.create(conn, checkfirst=True)
+            logger.info("Index %s is ready", index.name)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,24 @@
+"""Add the failed-reminder index used by the reminder scheduler
+
+New databases get it from create_all; run this once on existing ones:
+
+    python -m app.scripts.create_reminder_index
+"""
+import logging
+
+from app.core.database import engine
+from app.models.sms_archive import SMSArchive
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "ix_sms_archive_failed_reminders"
+
+def main():
+    index = next(index for index in SMSArchive.__table__.indexes if index.name == INDEX_NAME)
+    with engine.begin() as conn:
+        index.create(conn, checkfirst=True)
+    logger.info("Index %s is ready", index.name)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,39 @@
+"""Add the reservation full-text search column and GIN index
+
+New databases get them from create_all; run this once on existing ones
+(PostgreSQL 12+):
+
+    python -m app.scripts.create_search_index
+
+Adding the STORED generated column rewrites the reservations table under an
+ACCESS EXCLUSIVE lock, so reads and writes wait for it; run it off-peak.
+The GIN index is then built CONCURRENTLY and does not block writes. If that
+build fails it leaves an INVALID index behind: drop
+ix_reservations_search_vector and run the script again.
+"""
+import logging
+
+from sqlalchemy import text
+
+from app.core.database import engine
+from app.models.reservation import SEARCH_VECTOR_COLUMN_DDL, SEARCH_INDEX_DDL
+
+logger = logging.getLogger(__name__)
+
+def main():
+    if engine.dialect.name != "postgresql":
+        logger.info("Full-text search index is PostgreSQL only, nothing to do")
+        return
+    
+    with engine.begin() as conn:
+        conn.execute(text(SEARCH_VECTOR_COLUMN_DDL))
+    logger.info("Reservation search column is ready")
+    
+    # CONCURRENTLY can't run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(SEARCH_INDEX_DDL.format(concurrently="CONCURRENTLY ")))
+    logger.info("Reservation search index is ready")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
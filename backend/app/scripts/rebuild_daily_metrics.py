@@ -0,0 +1,28 @@
+"""Rebuild the daily_metrics rollup from reservations and sms_archive
+
+The rollup is kept up to date by every write path; run this once after
+upgrading (the table starts empty) or whenever it may have drifted:
+
+    python -m app.scripts.rebuild_daily_metrics
+"""
+import logging
+
+from app.core.database import SessionLocal
+from app.crud.daily_metric import daily_metric_crud
+
+logger = logging.getLogger(__name__)
+
+def main():
+    db = SessionLocal()
+    try:
+        rows = daily_metric_crud.rebuild(db)
+        logger.info("Rebuilt daily_metrics, %d rows", rows)
+    except ValueError as e:
+        logger.error("%s", e)
+        raise SystemExit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,92 @@
+import time
+from typing import Optional, Dict, Any
+
+from app.core.config import settings
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker around an unreliable dependency"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        recovery_timeout: Optional[float] = None,
+        half_open_max_calls: Optional[int] = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.SMS_CIRCUIT_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or settings.SMS_CIRCUIT_RECOVERY_TIMEOUT
+        self.half_open_max_calls = half_open_max_calls or settings.SMS_CIRCUIT_HALF_OPEN_CALLS
+        
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._total_failures = 0
+        self._total_successes = 0
+        self._times_opened = 0
+    
+    @property
+    def state(self) -> str:
+        """Current state, moving open -> half_open once the recovery timeout passed"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """Check whether a call may go through; half-open lets a few probes pass"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+    
+    def release(self):
+        """Give back a half-open probe slot for a call that never finished"""
+        if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+    
+    def record_success(self):
+        """Record a call that reached the dependency"""
+        self._total_successes += 1
+        self._failures = 0
+        self._state = self.CLOSED
+    
+    def record_failure(self):
+        """Record a failed call, opening the circuit past the threshold"""
+        self._total_failures += 1
+        self._failures += 1
+        
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open()
+    
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Get breaker state for monitoring"""
+        state = self.state
+        retry_in = None
+        if state == self.OPEN:
+            retry_in = round(self.recovery_timeout - (time.monotonic() - self._opened_at), 1)
+        
+        return {
+            "name": self.name,
+            "state": state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "retry_in_seconds": retry_in,
+            "times_opened": self._times_opened,
+            "total_successes": self._total_successes,
+            "total_failures": self._total_failures
+        }
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Token bucket with reservation: tokens may go negative, the caller sleeps for
+# the returned number of seconds. A live pause key (set on provider throttling)
+# makes every caller wait for its TTL without taking a token.
+TOKEN_BUCKET_SCRIPT = """
+local pause_ms = redis.call('PTTL', KEYS[2])
+if pause_ms > 0 then
+    return tostring(pause_ms / 1000)
+end
+
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate) - requested
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+class InMemoryTokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+    
+    def reserve(self, tokens: int = 1) -> float:
+        """Take tokens and return seconds to wait before using them"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        
+        self._tokens = min(
+            self.burst,
+            self._tokens + (now - self._updated_at) * self.rate
+        ) - tokens
+        self._updated_at = now
+        
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def pause(self, seconds: float):
+        """Block all callers for the given number of seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class RedisTokenBucket:
+    def __init__(self, redis_url: str, rate: float, burst: int, key: str):
+        from redis import asyncio as aioredis
+        
+        self.rate = rate
+        self.burst = burst
+        self.bucket_key = f"{key}:bucket"
+        self.pause_key = f"{key}:pause"
+        self._redis = aioredis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+    
+    async def reserve(self, tokens: int = 1) -> float:
+        """Take tokens and return seconds to wait before using them"""
+        wait = await self._script(
+            keys=[self.bucket_key, self.pause_key],
+            args=[self.rate, self.burst, tokens]
+        )
+        return float(wait)
+    
+    async def pause(self, seconds: float):
+        """Block callers in every process for the given number of seconds"""
+        await self._redis.set(self.pause_key, 1, px=max(1, int(seconds * 1000)))
+    
+    async def close(self):
+        await self._redis.aclose()
+
+class RateLimiter:
+    """Token bucket for provider calls, shared via Redis with an in-memory fallback"""
+    
+    REDIS_RETRY_SECONDS = 30
+    
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        redis_url: Optional[str] = None,
+        key: str = "sms:ratelimit"
+    ):
+        self.rate = rate or settings.SMS_RATE_LIMIT_PER_SECOND
+        self.burst = burst or settings.SMS_RATE_LIMIT_BURST
+        self._memory = InMemoryTokenBucket(self.rate, self.burst)
+        self._redis: Optional[RedisTokenBucket] = None
+        self._redis_retry_at = 0.0
+        self._backoff = 0.0
+        
+        redis_url = redis_url if redis_url is not None else settings.REDIS_URL
+        if settings.SMS_RATE_LIMIT_USE_REDIS and redis_url:
+            try:
+                self._redis = RedisTokenBucket(redis_url, self.rate, self.burst, key)
+            except ImportError:
+                logger.warning("redis package not installed, using in-memory SMS rate limiter")
+    
+    def _use_redis(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_retry_at
+    
+    def _redis_failed(self, error: Exception):
+        logger.warning("SMS rate limiter falling back to memory: %s", error)
+        self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+    
+    async def acquire(self, tokens: int = 1):
+        """Wait until the bucket allows another provider call"""
+        wait = None
+        if self._use_redis():
+            try:
+                wait = await self._redis.reserve(tokens)
+            except Exception as e:
+                self._redis_failed(e)
+        
+        if wait is None:
+            wait = self._memory.reserve(tokens)
+        
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    async def backoff(self):
+        """Pause all callers after the provider throttled us; doubles on each call"""
+        self._backoff = min(
+            settings.SMS_BACKOFF_MAX,
+            self._backoff * 2 if self._backoff else settings.SMS_BACKOFF_BASE
+        )
+        # Jitter so paused workers don't resume in lockstep
+        seconds = self._backoff * random.uniform(0.5, 1.0)
+        
+        self._memory.pause(seconds)
+        if self._use_redis():
+            try:
+                await self._redis.pause(seconds)
+            except Exception as e:
+                self._redis_failed(e)
+    
+    def reset_backoff(self):
+        """Reset backoff after a successful provider call"""
+        self._backoff = 0.0
+    
+    async def close(self):
+        if self._redis is not None:
+            try:
+                await self._redis.close()
+            except Exception:
+                pass
@@ -0,0 +1,357 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Provider calls return an envelope:
+#   {"success": True, "results": [...]}        for send / send_batch
+#   {"success": True, "statuses": {id: {...}}} for get_status
+#   {"success": False, "error": str, "retryable": bool, "throttled": bool, "maybe_sent": bool}
+# maybe_sent marks failures where the provider may still have accepted the request
+# (read timeouts, 5xx), so repeating a send could deliver it twice.
+# Each send result is {"success", "message_id", "status", "cost"} or {"success": False, "error"}.
+# Each status is {"status": str, "delivered": bool}.
+
+class SMSProvider(ABC):
+    name = "base"
+    max_batch_size = 1
+    final_statuses: List[str] = []
+    
+    def is_configured(self) -> bool:
+        """Check whether the provider has the credentials it needs"""
+        return True
+    
+    async def send(self, phone: str, message: str) -> Dict[str, Any]:
+        """Send one SMS"""
+        return await self.send_batch([(phone, message)])
+    
+    @abstractmethod
+    async def send_batch(self, messages: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Send (phone, message) pairs in one call, results in input order"""
+    
+    @abstractmethod
+    async def get_status(self, message_ids: List[str]) -> Dict[str, Any]:
+        """Get delivery status for many message IDs in one call"""
+    
+    async def close(self):
+        """Release provider resources"""
+
+class KavenegarProvider(SMSProvider):
+    name = "kavenegar"
+    max_batch_size = 200
+    
+    # Delivery status codes (sms/status.json)
+    DELIVERED = "10"
+    final_statuses = ["6", "10", "11", "13", "14", "100"]
+    
+    # Responses that mean "slow down" rather than "this message is bad"
+    THROTTLE_HTTP_STATUSES = {409, 429, 500, 502, 503, 504}
+    THROTTLE_API_STATUSES = {409, 429}
+    
+    # Throttling responses that say the request was rejected, not processed
+    REJECTED_HTTP_STATUSES = {409, 429}
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_url: Optional[str] = None,
+        sender: Optional[str] = None
+    ):
+        self.api_key = api_key if api_key is not None else settings.SMS_API_KEY
+        self.api_url = api_url or settings.SMS_API_URL
+        self.sender = sender or settings.SMS_SENDER
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    settings.SMS_READ_TIMEOUT,
+                    connect=settings.SMS_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.SMS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SMS_MAX_KEEPALIVE_CONNECTIONS
+                ),
+                http2=settings.SMS_HTTP2 and HTTP2_AVAILABLE
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client and its pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def send(self, phone: str, message: str) -> Dict[str, Any]:
+        """Send SMS via sms/send.json"""
+        response = await self._post("sms/send.json", {
+            "receptor": phone,
+            "message": message,
+            "sender": self.sender
+        })
+        if not response["success"]:
+            return response
+        
+        return {
+            "success": True,
+            "results": [self._entry_result(response["entries"][0])]
+        }
+    
+    async def send_batch(self, messages: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Send SMS via sms/sendarray.json"""
+        if len(messages) == 1:
+            return await self.send(*messages[0])
+        
+        response = await self._post("sms/sendarray.json", {
+            "receptor": json.dumps([phone for phone, _ in messages]),
+            "message": json.dumps([message for _, message in messages], ensure_ascii=False),
+            "sender": json.dumps([self.sender] * len(messages))
+        })
+        if not response["success"]:
+            return response
+        
+        # Entries come back in the same order as the receptors
+        return {
+            "success": True,
+            "results": [self._entry_result(entry) for entry in response["entries"]]
+        }
+    
+    async def get_status(self, message_ids: List[str]) -> Dict[str, Any]:
+        """Get delivery status via sms/status.json"""
+        response = await self._post("sms/status.json", {
+            "messageid": ",".join(message_ids)
+        })
+        if not response["success"]:
+            return response
+        
+        return {
+            "success": True,
+            "statuses": {
+                str(entry["messageid"]): {
+                    "status": str(entry["status"]),
+                    "delivered": str(entry["status"]) == self.DELIVERED
+                }
+                for entry in response["entries"]
+            }
+        }
+    
+    async def _post(self, method: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST to a Kavenegar API method and return its entries"""
+        url = f"{self.api_url}/{self.api_key}/{method}"
+        
+        try:
+            response = await self._get_client().post(url, data=payload)
+            
+            if response.status_code in self.THROTTLE_HTTP_STATUSES:
+                return {
+                    "success": False,
+                    "retryable": True,
+                    "throttled": True,
+                    "maybe_sent": response.status_code not in self.REJECTED_HTTP_STATUSES,
+                    "error": f"HTTP Error: {response.status_code}"
+                }
+            
+            if response.status_code != 200:
+                return {
+                    "success": False,
+                    "error": f"HTTP Error: {response.status_code}"
+                }
+            
+            data = response.json()
+            return_status = data["return"]["status"]
+            
+            if return_status == 200:
+                return {
+                    "success": True,
+                    "entries": data["entries"]
+                }
+            elif return_status in self.THROTTLE_API_STATUSES:
+                return {
+                    "success": False,
+                    "retryable": True,
+                    "throttled": True,
+                    "error": f"API Error: {data['return']['message']}"
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"API Error: {data['return']['message']}"
+                }
+        
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            # The request never left this process
+            return {
+                "success": False,
+                "retryable": True,
+                "error": f"Network Error: {str(e)}"
+            }
+        except httpx.HTTPError as e:
+            return {
+                "success": False,
+                "retryable": True,
+                "maybe_sent": True,
+                "error": f"Network Error: {str(e)}"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Unexpected Error: {str(e)}"
+            }
+    
+    def _entry_result(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a Kavenegar response entry to a send result"""
+        return {
+            "success": True,
+            "message_id": str(entry["messageid"]),
+            "status": entry["status"],
+            "cost": entry.get("cost", 0)
+        }
+
+class FakeSMSProvider(SMSProvider):
+    """In-process provider with configurable latency, error rate and throttling, for load tests"""
+    
+    name = "fake"
+    max_batch_size = 200
+    
+    SENT = "1"
+    DELIVERED = "10"
+    final_statuses = ["10"]
+    
+    def __init__(
+        self,
+        latency_ms: Optional[float] = None,
+        error_rate: Optional[float] = None,
+        throttle_per_second: Optional[int] = None,
+        cost: int = 120,
+        seed: Optional[int] = None,
+        keep_messages: int = 10000
+    ):
+        self.latency_ms = settings.SMS_FAKE_LATENCY_MS if latency_ms is None else latency_ms
+        self.error_rate = settings.SMS_FAKE_ERROR_RATE if error_rate is None else error_rate
+        self.throttle_per_second = (
+            settings.SMS_FAKE_THROTTLE_PER_SECOND if throttle_per_second is None else throttle_per_second
+        )
+        self.cost = cost
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._window = 0
+        self._window_calls = 0
+        
+        # Counters for comparing runs
+        self.calls = 0
+        self.throttled_calls = 0
+        self.failed_calls = 0
+        self.messages_sent = 0
+        
+        # Most recent messages for inspection, bounded for long load runs (0 keeps none)
+        self.keep_messages = keep_messages
+        self.sent_messages: Dict[str, Tuple[str, str]] = OrderedDict()
+        self._last_id = 0
+    
+    async def send_batch(self, messages: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Pretend to send (phone, message) pairs"""
+        failure = await self._simulate_call()
+        if failure:
+            return failure
+        
+        results = []
+        for phone, message in messages:
+            self._last_id = next(self._ids)
+            message_id = str(self._last_id)
+            if self.keep_messages:
+                self.sent_messages[message_id] = (phone, message)
+                if len(self.sent_messages) > self.keep_messages:
+                    self.sent_messages.popitem(last=False)
+            results.append({
+                "success": True,
+                "message_id": message_id,
+                "status": self.SENT,
+                "cost": self.cost
+            })
+        
+        self.messages_sent += len(messages)
+        return {
+            "success": True,
+            "results": results
+        }
+    
+    async def get_status(self, message_ids: List[str]) -> Dict[str, Any]:
+        """Report every message this provider issued as delivered"""
+        failure = await self._simulate_call()
+        if failure:
+            return failure
+        
+        return {
+            "success": True,
+            "statuses": {
+                message_id: {"status": self.DELIVERED, "delivered": True}
+                for message_id in message_ids
+                if message_id.isdigit() and 0 < int(message_id) <= self._last_id
+            }
+        }
+    
+    async def _simulate_call(self) -> Optional[Dict[str, Any]]:
+        """Apply latency, throttling and random errors; return an error envelope or None"""
+        self.calls += 1
+        
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        
+        if self.throttle_per_second:
+            window = int(time.monotonic())
+            if window != self._window:
+                self._window = window
+                self._window_calls = 0
+            self._window_calls += 1
+            
+            if self._window_calls > self.throttle_per_second:
+                self.throttled_calls += 1
+                return {
+                    "success": False,
+                    "retryable": True,
+                    "throttled": True,
+                    "error": "HTTP Error: 429"
+                }
+        
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.failed_calls += 1
+            # Same envelope KavenegarProvider returns for a 503
+            return {
+                "success": False,
+                "retryable": True,
+                "throttled": True,
+                "maybe_sent": True,
+                "error": "HTTP Error: 503"
+            }
+        
+        return None
+
+def get_sms_provider(name: Optional[str] = None) -> SMSProvider:
+    """Create the SMS provider selected by SMS_PROVIDER"""
+    name = name or settings.SMS_PROVIDER
+    
+    if name == KavenegarProvider.name:
+        return KavenegarProvider()
+    if name == FakeSMSProvider.name:
+        return FakeSMSProvider()
+    
+    raise ValueError(f"Unknown SMS provider: {name}")
@@ -1,18 +1,50 @@
-import requests
-import json
-from typing import Optional, Dict, Any
-from datetime import datetime
+import asyncio
+import random
+import time
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func, insert, update, or_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.metrics import SMS_PROVIDER_CALLS, SMS_PROVIDER_DURATION
+from app.core.pagination import keyset_before, count_rows, count_cache_key
+from app.core.phone import normalize_phone
+from app.crud.daily_metric import daily_metric_crud, sms_delta, sms_day, SMS
+from app.crud.reservation import reservation_crud
+from app.models.daily_metric import DailyMetric
 from app.models.sms_archive import SMSArchive
 from app.models.reservation import Reservation
 from app.models.user import User
+from app.services.rate_limiter import RateLimiter
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.sms_providers import SMSProvider, get_sms_provider
+from app.services.sms_templates import render_template, render_batch
+
+# Columns process_outbox needs to send a row and compute its rollup deltas
+OUTBOX_COLUMNS = (
+    SMSArchive.id,
+    SMSArchive.recipient_phone,
+    SMSArchive.message,
+    SMSArchive.attempts,
+    SMSArchive.sms_type,
+    SMSArchive.reservation_id,
+    SMSArchive.status,
+    SMSArchive.sent_at,
+    SMSArchive.sent_by,
+    SMSArchive.cost
+)
 
 class SMSService:
-    def __init__(self):
-        self.api_key = settings.SMS_API_KEY
-        self.api_url = settings.SMS_API_URL
-        self.sender = settings.SMS_SENDER
+    def __init__(self, provider: Optional[SMSProvider] = None):
+        self.provider = provider or get_sms_provider()
+        self.rate_limiter = RateLimiter()
+        self.circuit_breaker = CircuitBreaker(self.provider.name)
+    
+    async def close(self):
+        """Close the provider client and rate limiter connections"""
+        await self.provider.close()
+        await self.rate_limiter.close()
     
     async def send_sms(
         self, 
@@ -36,24 +68,36 @@ class SMSService:
                 "error": "Phone, message, and recipient name are required"
             }
         
+        # Provider is down: queue to the outbox instead of failing
+        if settings.SMS_QUEUE_WHEN_CIRCUIT_OPEN and self.circuit_breaker.state == CircuitBreaker.OPEN:
+            queued = self.enqueue_sms(
+                db=db,
+                phone=phone,
+                message=message,
+                recipient_name=recipient_name,
+                sent_by_user_id=sent_by_user_id,
+                reservation_id=reservation_id,
+                sms_type=sms_type
+            )
+            queued["queued"] = True
+            return queued
+        
         # Send SMS via provider
-        sms_result = await self._send_via_kavenegar(phone, message)
+        sms_result = await self._send_single(phone, message)
         
         # Save to archive
-        archive_record = SMSArchive(
+        archive_record = SMSArchive(**self._archive_values(
+            phone=phone,
             message=message,
-            recipient_phone=phone,
             recipient_name=recipient_name,
-            sms_type=sms_type,
-            status="sent" if sms_result["success"] else "failed",
-            provider_message_id=sms_result.get("message_id"),
-            provider_status=sms_result.get("status"),
-            cost=sms_result.get("cost"),
+            sent_by_user_id=sent_by_user_id,
             reservation_id=reservation_id,
-            sent_by=sent_by_user_id
-        )
+            sms_type=sms_type,
+            sms_result=sms_result
+        ))
         
         db.add(archive_record)
+        daily_metric_crud.apply(db, [sms_delta(archive_record)])
         db.commit()
         db.refresh(archive_record)
         
@@ -70,47 +114,497 @@ class SMSService:
         recipients: list, 
         message: str,
         sent_by_user_id: int,
-        sms_type: str = "manual"
+        sms_type: str = "manual",
+        concurrency: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Send bulk SMS"""
+        """Send bulk SMS in provider batches with one archive insert"""
+        items = [
+            {
+                "phone": recipient.get("phone"),
+                "name": recipient.get("name"),
+                "message": message,
+                "reservation_id": recipient.get("reservation_id")
+            }
+            for recipient in recipients
+        ]
+        
+        sms_results = await self._send_batched(
+            db=db,
+            items=items,
+            sent_by_user_id=sent_by_user_id,
+            sms_type=sms_type,
+            concurrency=concurrency
+        )
+        db.commit()
+        
         results = []
         success_count = 0
         fail_count = 0
         
+        for recipient, sms_result in zip(recipients, sms_results):
+            if sms_result["success"]:
+                success_count += 1
+            else:
+                fail_count += 1
+            
+            results.append({
+                "phone": recipient.get("phone"),
+                "name": recipient.get("name"),
+                "success": sms_result["success"],
+                "error": sms_result.get("error")
+            })
+        
+        return {
+            "total": len(recipients),
+            "success_count": success_count,
+            "fail_count": fail_count,
+            "results": results
+        }
+    
+    async def send_bulk_reminders(
+        self, 
+        db: Session, 
+        reservations: List[Reservation],
+        template: str,
+        sent_by_user_id: int,
+        concurrency: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Send reminder SMS for many reservations in provider batches"""
+        messages = render_batch(template, reservations)
+        items = [
+            {
+                "phone": reservation.phone_number,
+                "name": reservation.owner_name,
+                "message": message,
+                "reservation_id": reservation.id
+            }
+            for reservation, message in zip(reservations, messages)
+        ]
+        
+        sms_results = await self._send_batched(
+            db=db,
+            items=items,
+            sent_by_user_id=sent_by_user_id,
+            sms_type="auto_reminder",
+            concurrency=concurrency,
+            archive_invalid=True,
+            archive_circuit_open=False
+        )
+        
+        # Mark reminders as sent in a single UPDATE, same transaction as the archive rows
+        sent_ids = [
+            reservation.id
+            for reservation, sms_result in zip(reservations, sms_results)
+            if sms_result["success"]
+        ]
+        failed_ids = [
+            reservation.id
+            for reservation, sms_result in zip(reservations, sms_results)
+            if not sms_result["success"]
+        ]
+        if sent_ids:
+            db.execute(
+                update(Reservation)
+                .where(Reservation.id.in_(sent_ids))
+                .values(reminder_sent=True)
+            )
+        db.commit()
+        
+        return {
+            "total": len(reservations),
+            "success_count": len(sent_ids),
+            "fail_count": len(reservations) - len(sent_ids),
+            "reservation_ids": sent_ids,
+            "failed_ids": failed_ids
+        }
+    
+    async def send_due_reminders(
+        self,
+        db: Session,
+        template: str,
+        sent_by_user_id: int,
+        days_before: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Claim and send due reminders batch by batch until none are left
+        
+        Claims go through claim_due_reminders (FOR UPDATE SKIP LOCKED plus retry
+        bookkeeping), so the scheduler and manual runs never send the same reminder twice.
+        """
+        totals = {"total": 0, "sent": 0, "failed": 0}
+        
+        # Failed rows stay unsent; skip them for the rest of this run. Later runs
+        # retry them with backoff (see claim_due_reminders).
+        failed_ids = []
+        
+        while True:
+            reservations = reservation_crud.claim_due_reminders(
+                db=db,
+                days_before=settings.REMINDER_DAYS_BEFORE if days_before is None else days_before,
+                limit=batch_size or settings.REMINDER_BATCH_SIZE,
+                exclude_ids=failed_ids
+            )
+            if not reservations:
+                db.commit()
+                break
+            
+            # Row locks are held until send_bulk_reminders commits reminder_sent
+            result = await self.send_bulk_reminders(
+                db=db,
+                reservations=reservations,
+                template=template,
+                sent_by_user_id=sent_by_user_id
+            )
+            
+            totals["total"] += result["total"]
+            totals["sent"] += result["success_count"]
+            totals["failed"] += result["fail_count"]
+            failed_ids.extend(result["failed_ids"])
+        
+        return totals
+    
+    async def _send_batched(
+        self,
+        db: Session,
+        items: List[Dict[str, Any]],
+        sent_by_user_id: int,
+        sms_type: str,
+        concurrency: Optional[int] = None,
+        archive_invalid: bool = False,
+        archive_circuit_open: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Send {phone, name, message, reservation_id} items in provider batches, stage their archive rows in one INSERT and return results in input order
+        
+        With archive_invalid, items with an unusable phone number also get a failed
+        archive row; without archive_circuit_open, items that never reached the
+        provider because the circuit was open get none.
+        """
+        sms_results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        valid = []
+        archive_rows = []
+        
+        for index, item in enumerate(items):
+            phone = self._clean_phone_number(item.get("phone") or "")
+            
+            # Validate inputs
+            if not phone or not item.get("message") or not item.get("name"):
+                sms_results[index] = {
+                    "success": False,
+                    "error": "Phone, message, and recipient name are required"
+                }
+                if archive_invalid and item.get("message") and item.get("name"):
+                    archive_rows.append(self._archive_values(
+                        phone=(item.get("phone") or "")[:20],
+                        message=item["message"],
+                        recipient_name=item["name"],
+                        sent_by_user_id=sent_by_user_id,
+                        reservation_id=item.get("reservation_id"),
+                        sms_type=sms_type,
+                        sms_result=sms_results[index]
+                    ))
+            else:
+                valid.append((index, phone))
+        
+        dispatched = await self._dispatch_batches(
+            [(phone, items[index]["message"]) for index, phone in valid],
+            concurrency=concurrency
+        )
+        
+        for (index, phone), sms_result in zip(valid, dispatched):
+            sms_results[index] = sms_result
+            if sms_result.get("circuit_open") and not archive_circuit_open:
+                continue
+            archive_rows.append(self._archive_values(
+                phone=phone,
+                message=items[index]["message"],
+                recipient_name=items[index]["name"],
+                sent_by_user_id=sent_by_user_id,
+                reservation_id=items[index].get("reservation_id"),
+                sms_type=sms_type,
+                sms_result=sms_result
+            ))
+        
+        # Save all archive rows in a single INSERT; callers commit
+        if archive_rows:
+            db.execute(insert(SMSArchive), archive_rows)
+            daily_metric_crud.apply(db, [sms_delta(row) for row in archive_rows])
+        
+        return sms_results
+    
+    async def _dispatch_batches(
+        self,
+        messages: List[tuple],
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Send (phone, message) pairs in concurrent provider batches, results in input order"""
+        batch_size = min(settings.SMS_BATCH_SIZE, self.provider.max_batch_size)
+        batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+        semaphore = asyncio.Semaphore(concurrency or settings.SMS_BULK_CONCURRENCY)
+        
+        async def dispatch(batch: List[tuple]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self._send_batch(batch)
+        
+        batch_results = await asyncio.gather(*(dispatch(batch) for batch in batches))
+        return [result for results in batch_results for result in results]
+    
+    def enqueue_sms(
+        self, 
+        db: Session, 
+        phone: str, 
+        message: str, 
+        recipient_name: str,
+        sent_by_user_id: int,
+        reservation_id: Optional[int] = None,
+        sms_type: str = "manual"
+    ) -> Dict[str, Any]:
+        """Queue SMS in the outbox as a pending archive row"""
+        
+        # Clean phone number
+        phone = self._clean_phone_number(phone)
+        
+        # Validate inputs
+        if not phone or not message or not recipient_name:
+            return {
+                "success": False,
+                "error": "Phone, message, and recipient name are required"
+            }
+        
+        archive_record = SMSArchive(**self._pending_values(
+            phone=phone,
+            message=message,
+            recipient_name=recipient_name,
+            sent_by_user_id=sent_by_user_id,
+            reservation_id=reservation_id,
+            sms_type=sms_type
+        ))
+        
+        db.add(archive_record)
+        daily_metric_crud.apply(db, [sms_delta(archive_record)])
+        db.commit()
+        db.refresh(archive_record)
+        
+        return {
+            "success": True,
+            "archive_id": archive_record.id,
+            "status": archive_record.status
+        }
+    
+    def enqueue_bulk_sms(
+        self, 
+        db: Session, 
+        recipients: list, 
+        message: str,
+        sent_by_user_id: int,
+        sms_type: str = "manual"
+    ) -> Dict[str, Any]:
+        """Queue bulk SMS in the outbox with a single INSERT"""
+        results = []
+        pending_rows = []
+        
         for recipient in recipients:
-            phone = recipient.get("phone")
+            phone = self._clean_phone_number(recipient.get("phone") or "")
             name = recipient.get("name")
-            reservation_id = recipient.get("reservation_id")
             
-            result = await self.send_sms(
-                db=db,
+            # Validate inputs
+            if not phone or not message or not name:
+                results.append({
+                    "phone": recipient.get("phone"),
+                    "name": name,
+                    "success": False,
+                    "error": "Phone, message, and recipient name are required"
+                })
+                continue
+            
+            pending_rows.append(self._pending_values(
                 phone=phone,
                 message=message,
                 recipient_name=name,
                 sent_by_user_id=sent_by_user_id,
-                reservation_id=reservation_id,
+                reservation_id=recipient.get("reservation_id"),
                 sms_type=sms_type
-            )
-            
-            if result["success"]:
-                success_count += 1
-            else:
-                fail_count += 1
-            
+            ))
             results.append({
-                "phone": phone,
+                "phone": recipient.get("phone"),
                 "name": name,
-                "success": result["success"],
-                "error": result.get("error")
+                "success": True,
+                "error": None
             })
         
+        if pending_rows:
+            db.execute(insert(SMSArchive), pending_rows)
+            daily_metric_crud.apply(db, [sms_delta(row) for row in pending_rows])
+            db.commit()
+        
         return {
             "total": len(recipients),
-            "success_count": success_count,
-            "fail_count": fail_count,
+            "success_count": len(pending_rows),
+            "fail_count": len(recipients) - len(pending_rows),
             "results": results
         }
     
+    async def process_outbox(self, db: Session, batch_size: Optional[int] = None) -> int:
+        """Claim and send one batch of pending outbox rows, returns rows processed"""
+        # Leave rows untouched while the provider is down so they keep their attempts
+        state = self.circuit_breaker.state
+        if state == CircuitBreaker.OPEN:
+            return 0
+        
+        batch_size = batch_size or settings.SMS_OUTBOX_BATCH_SIZE
+        if state == CircuitBreaker.HALF_OPEN:
+            # Probe with a single provider batch
+            batch_size = min(batch_size, settings.SMS_BATCH_SIZE, self.provider.max_batch_size)
+        
+        now = datetime.now(timezone.utc)
+        
+        # Claim a batch; SKIP LOCKED lets any number of workers drain in parallel.
+        # Pushing next_attempt_at forward leases the rows, so a crashed worker's
+        # rows become visible again once the lease expires. Selecting columns, not
+        # entities, means the lease commit doesn't expire and reload every row.
+        records = db.query(*OUTBOX_COLUMNS).filter(
+            SMSArchive.status == "pending",
+            or_(
+                SMSArchive.next_attempt_at.is_(None),
+                SMSArchive.next_attempt_at <= now
+            )
+        ).order_by(SMSArchive.id).limit(batch_size).with_for_update(skip_locked=True).all()
+        
+        if not records:
+            db.commit()
+            return 0
+        
+        db.execute(
+            update(SMSArchive)
+            .where(SMSArchive.id.in_([record.id for record in records]))
+            .values(next_attempt_at=now + timedelta(seconds=settings.SMS_OUTBOX_LEASE_SECONDS))
+        )
+        db.commit()
+        
+        sms_results = await self._dispatch_batches(
+            [(record.recipient_phone, record.message) for record in records]
+        )
+        
+        finished_at = datetime.now(timezone.utc)
+        changes = []
+        reminder_ids = []
+        metric_deltas = []
+        
+        for record, sms_result in zip(records, sms_results):
+            if sms_result.get("circuit_open"):
+                # Never reached the provider: drop the lease, keep the attempt budget
+                changes.append({"id": record.id, "next_attempt_at": None})
+                continue
+            
+            attempts = (record.attempts or 0) + 1
+            
+            if sms_result["success"]:
+                change = {
+                    "status": "sent",
+                    "provider_message_id": sms_result.get("message_id"),
+                    "provider_status": sms_result.get("status"),
+                    "cost": sms_result.get("cost"),
+                    "sent_at": finished_at,
+                    "last_error": None
+                }
+                if record.sms_type == "auto_reminder" and record.reservation_id:
+                    reminder_ids.append(record.reservation_id)
+            elif (
+                not sms_result.get("retryable")
+                or sms_result.get("maybe_sent")
+                or attempts >= settings.SMS_OUTBOX_MAX_ATTEMPTS
+            ):
+                # Don't resend what the provider rejected or may already have accepted
+                change = {
+                    "status": "failed",
+                    "last_error": sms_result.get("error"),
+                    "maybe_sent": bool(sms_result.get("maybe_sent"))
+                }
+            else:
+                # Exponential backoff before the next attempt
+                delay = settings.SMS_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+                changes.append({
+                    "id": record.id,
+                    "attempts": attempts,
+                    "next_attempt_at": finished_at + timedelta(seconds=delay),
+                    "last_error": sms_result.get("error")
+                })
+                continue
+            
+            changes.append({"id": record.id, "attempts": attempts, "next_attempt_at": None, **change})
+            metric_deltas += [sms_delta(record, -1), sms_delta({**record._asdict(), **change})]
+        
+        # Bulk UPDATE by primary key
+        db.execute(update(SMSArchive), changes)
+        
+        if reminder_ids:
+            db.execute(
+                update(Reservation)
+                .where(Reservation.id.in_(reminder_ids))
+                .values(reminder_sent=True)
+            )
+        
+        daily_metric_crud.apply(db, metric_deltas)
+        db.commit()
+        return len(records)
+    
+    async def refresh_delivery_status(
+        self, 
+        db: Session, 
+        max_age_hours: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> int:
+        """Poll provider delivery status for undelivered messages, returns rows updated"""
+        batch_size = batch_size or settings.SMS_STATUS_BATCH_SIZE
+        cutoff = datetime.now(timezone.utc) - timedelta(
+            hours=max_age_hours or settings.SMS_STATUS_MAX_AGE_HOURS
+        )
+        updated = 0
+        last_id = 0
+        
+        while True:
+            # Walk undelivered rows by id so every row is polled once per run
+            rows = db.query(SMSArchive.id, SMSArchive.provider_message_id).filter(
+                SMSArchive.status == "sent",
+                SMSArchive.delivered_at.is_(None),
+                SMSArchive.provider_message_id.isnot(None),
+                or_(
+                    SMSArchive.provider_status.is_(None),
+                    SMSArchive.provider_status.notin_(self.provider.final_statuses)
+                ),
+                SMSArchive.sent_at >= cutoff,
+                SMSArchive.id > last_id
+            ).order_by(SMSArchive.id).limit(batch_size).all()
+            
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            statuses = await self._get_delivery_status([row.provider_message_id for row in rows])
+            checked_at = datetime.now(timezone.utc)
+            
+            changes = []
+            for row in rows:
+                delivery = statuses.get(row.provider_message_id)
+                if not delivery:
+                    continue
+                
+                changes.append({
+                    "id": row.id,
+                    "provider_status": delivery["status"],
+                    "delivered_at": checked_at if delivery["delivered"] else None
+                })
+            
+            # Bulk UPDATE by primary key
+            if changes:
+                db.execute(update(SMSArchive), changes)
+                db.commit()
+                updated += len(changes)
+            
+            if len(rows) < batch_size:
+                break
+        
+        return updated
+    
     async def send_reminder_sms(
         self, 
         db: Session, 
@@ -133,157 +627,270 @@ class SMSService:
             sms_type="auto_reminder"
         )
         
-        # Mark reminder as sent if successful
-        if result["success"]:
+        # Mark reminder as sent if successful; queued reminders are marked by the outbox worker
+        if result["success"] and not result.get("queued"):
             reservation.reminder_sent = True
             db.commit()
         
         return result
     
-    async def _send_via_kavenegar(self, phone: str, message: str) -> Dict[str, Any]:
-        """Send SMS via Kavenegar API"""
-        if not self.api_key:
-            return {
+    async def _send_single(self, phone: str, message: str) -> Dict[str, Any]:
+        """Send one SMS via the provider"""
+        response = await self._call_provider(self.provider.send, phone, message, idempotent=False)
+        if not response["success"]:
+            return response
+        
+        return response["results"][0]
+    
+    async def _send_batch(self, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Send (phone, message) pairs in one provider call, one result per pair"""
+        response = await self._call_provider(self.provider.send_batch, messages, idempotent=False)
+        if not response["success"]:
+            return [dict(response) for _ in messages]
+        
+        results = response["results"]
+        return [
+            results[index] if index < len(results) else {
                 "success": False,
-                "error": "SMS API key not configured"
+                "error": "API Error: missing entry in batch response"
             }
+            for index in range(len(messages))
+        ]
+    
+    async def _get_delivery_status(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get provider delivery status for many message IDs, keyed by message ID"""
+        response = await self._call_provider(self.provider.get_status, message_ids)
+        if not response["success"]:
+            return {}
         
-        url = f"{self.api_url}/{self.api_key}/sms/send.json"
+        return response["statuses"]
+    
+    async def _call_provider(
+        self, 
+        operation: Callable[..., Awaitable[Dict[str, Any]]], 
+        *args,
+        idempotent: bool = True
+    ) -> Dict[str, Any]:
+        """Call a provider operation through the rate limiter and circuit breaker with jittered retries
         
-        payload = {
-            "receptor": phone,
-            "message": message,
-            "sender": self.sender
-        }
+        Non-idempotent operations (sends) are only retried when the provider
+        cannot have accepted the request: connect errors and explicit 409/429.
+        """
+        provider_name = self.provider.name
+        operation_name = operation.__name__
         
-        try:
-            response = requests.post(url, data=payload, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data["return"]["status"] == 200:
-                    entry = data["entries"][0]
-                    return {
-                        "success": True,
-                        "message_id": str(entry["messageid"]),
-                        "status": entry["status"],
-                        "cost": entry.get("cost", 0)
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": f"API Error: {data['return']['message']}"
-                    }
-            else:
+        if not self.provider.is_configured():
+            SMS_PROVIDER_CALLS.labels(provider_name, operation_name, "not_configured").inc()
+            # Retryable so queued rows wait for the key instead of failing
+            return {
+                "success": False,
+                "retryable": True,
+                "error": "SMS API key not configured"
+            }
+        
+        attempts = max(1, settings.SMS_RETRY_ATTEMPTS)
+        for attempt in range(attempts):
+            if not self.circuit_breaker.allow_request():
+                SMS_PROVIDER_CALLS.labels(provider_name, operation_name, "circuit_open").inc()
                 return {
                     "success": False,
-                    "error": f"HTTP Error: {response.status_code}"
+                    "retryable": True,
+                    "circuit_open": True,
+                    "error": "SMS provider unavailable (circuit open)"
                 }
+            
+            try:
+                await self.rate_limiter.acquire()
+                start = time.perf_counter()
+                result = await operation(*args)
+            except BaseException:
+                # Cancelled or crashed: without this a half-open breaker would never get its slot back
+                self.circuit_breaker.release()
+                raise
+            SMS_PROVIDER_DURATION.labels(provider_name, operation_name).observe(time.perf_counter() - start)
+            
+            if result["success"]:
+                outcome = "success"
+            elif result.get("throttled"):
+                outcome = "throttled"
+            else:
+                outcome = "error"
+            SMS_PROVIDER_CALLS.labels(provider_name, operation_name, outcome).inc()
+            
+            if result.get("throttled"):
+                await self.rate_limiter.backoff()
+            elif result["success"]:
+                self.rate_limiter.reset_backoff()
+            
+            # Only network errors, throttling and 5xx count against the provider
+            if result["success"] or not result.get("retryable"):
+                self.circuit_breaker.record_success()
+                return result
+            
+            self.circuit_breaker.record_failure()
+            if attempt == attempts - 1 or (result.get("maybe_sent") and not idempotent):
+                return result
+            
+            # Exponential backoff with full jitter
+            await asyncio.sleep(random.uniform(0, settings.SMS_RETRY_BASE_DELAY * 2 ** attempt))
         
-        except requests.exceptions.RequestException as e:
-            return {
-                "success": False,
-                "error": f"Network Error: {str(e)}"
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Unexpected Error: {str(e)}"
-            }
+        return result
+    
+    def _archive_values(
+        self,
+        phone: str,
+        message: str,
+        recipient_name: str,
+        sent_by_user_id: int,
+        reservation_id: Optional[int],
+        sms_type: str,
+        sms_result: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build SMSArchive column values for a provider result"""
+        return {
+            "message": message,
+            "recipient_phone": phone,
+            "recipient_name": recipient_name,
+            "sms_type": sms_type,
+            "status": "sent" if sms_result["success"] else "failed",
+            "provider_message_id": sms_result.get("message_id"),
+            "provider_status": sms_result.get("status"),
+            "cost": sms_result.get("cost"),
+            "last_error": None if sms_result["success"] else sms_result.get("error"),
+            "maybe_sent": bool(sms_result.get("maybe_sent")),
+            "reservation_id": reservation_id,
+            "sent_by": sent_by_user_id
+        }
+    
+    def _pending_values(
+        self,
+        phone: str,
+        message: str,
+        recipient_name: str,
+        sent_by_user_id: int,
+        reservation_id: Optional[int],
+        sms_type: str
+    ) -> Dict[str, Any]:
+        """Build SMSArchive column values for a queued outbox row"""
+        return {
+            "message": message,
+            "recipient_phone": phone,
+            "recipient_name": recipient_name,
+            "sms_type": sms_type,
+            "status": "pending",
+            "attempts": 0,
+            "reservation_id": reservation_id,
+            "sent_by": sent_by_user_id
+        }
     
     def _clean_phone_number(self, phone: str) -> str:
-        """Clean and format phone number"""
-        # Remove any non-digit characters
-        phone = ''.join(filter(str.isdigit, phone))
-        
-        # Handle Iranian mobile numbers
-        if phone.startswith("0"):
-            phone = "98" + phone[1:]
-        elif not phone.startswith("98"):
-            phone = "98" + phone
-        
-        return phone
+        """Clean and format phone number for the provider (98...)"""
+        return normalize_phone(phone).lstrip("+")
     
     def _process_template(self, template: str, reservation: Reservation) -> str:
         """Process SMS template with reservation data"""
-        replacements = {
-            "[نام حیوان]": reservation.pet_name,
-            "[نام صاحب]": reservation.owner_name,
-            "[تاریخ]": reservation.next_visit_date.strftime("%Y/%m/%d") if reservation.next_visit_date else "",
-            "[نوع واکسن]": reservation.vaccine_type,
-            "[نژاد]": reservation.breed or "نامشخص",
-            "[وزن]": f"{reservation.weight} کیلوگرم" if reservation.weight else "نامشخص",
-            "[قیمت]": f"{reservation.price:,} تومان" if reservation.price else "نامشخص"
-        }
-        
-        message = template
-        for placeholder, value in replacements.items():
-            message = message.replace(placeholder, str(value))
-        
-        return message
+        return render_template(template, reservation)
     
-    def get_sms_archive(
+    async def get_sms_archive_async(
         self, 
-        db: Session, 
+        db: AsyncSession, 
         filters: dict,
         skip: int = 0, 
         limit: int = 100
     ) -> tuple:
-        """Get SMS archive with filters"""
-        query = db.query(SMSArchive)
+        """Get SMS archive with filters (AsyncSession)
+        
+        Returns (records, total, total_is_exact); filters["count"] picks the count mode.
+        """
+        conditions = self._archive_filter_conditions(filters)
+        
+        # Get total count
+        total, total_exact = await count_rows(
+            db,
+            SMSArchive.__table__,
+            conditions,
+            mode=filters.get("count") or "exact",
+            cache_key=count_cache_key(SMSArchive.__tablename__, filters),
+            unfiltered=not conditions
+        )
+        
+        # Get records with pagination
+        result = await db.execute(
+            self._paginate_archive(
+                select(SMSArchive).where(*conditions), filters, skip, limit,
+                db.get_bind().dialect.name
+            )
+        )
+        
+        return list(result.scalars().all()), total, total_exact
+    
+    def _paginate_archive(self, query, filters: dict, skip: int, limit: int, dialect: str = "postgresql"):
+        """Apply keyset pagination when filters["after"] is set, offset otherwise"""
+        if filters.get("after"):
+            condition, order = keyset_before(SMSArchive.sent_at, SMSArchive.id, filters["after"], dialect)
+            return query.filter(condition).order_by(*order).limit(limit)
+        
+        return query.order_by(SMSArchive.sent_at.desc(), SMSArchive.id.desc()).offset(skip).limit(limit)
+    
+    def _archive_filter_conditions(self, filters: dict) -> list:
+        """Build WHERE conditions for SMS archive filters"""
+        conditions = []
         
-        # Apply filters
         if filters.get("search"):
             search_term = f"%{filters['search']}%"
-            query = query.filter(
+            conditions.append(
                 SMSArchive.message.ilike(search_term) |
                 SMSArchive.recipient_name.ilike(search_term) |
                 SMSArchive.recipient_phone.ilike(search_term)
             )
         
         if filters.get("sms_type") and filters["sms_type"] != "all":
-            query = query.filter(SMSArchive.sms_type == filters["sms_type"])
+            conditions.append(SMSArchive.sms_type == filters["sms_type"])
         
         if filters.get("status") and filters["status"] != "all":
-            query = query.filter(SMSArchive.status == filters["status"])
+            conditions.append(SMSArchive.status == filters["status"])
         
         if filters.get("sent_date_from"):
-            query = query.filter(SMSArchive.sent_at >= filters["sent_date_from"])
+            conditions.append(SMSArchive.sent_at >= filters["sent_date_from"])
         
         if filters.get("sent_date_to"):
-            query = query.filter(SMSArchive.sent_at <= filters["sent_date_to"])
+            conditions.append(SMSArchive.sent_at <= filters["sent_date_to"])
         
         if filters.get("sent_by"):
-            query = query.filter(SMSArchive.sent_by == filters["sent_by"])
-        
-        # Get total count
-        total = query.count()
-        
-        # Get records with pagination
-        records = query.order_by(SMSArchive.sent_at.desc()).offset(skip).limit(limit).all()
+            conditions.append(SMSArchive.sent_by == filters["sent_by"])
         
-        return records, total
+        return conditions
     
     def get_sms_statistics(self, db: Session) -> Dict[str, int]:
-        """Get SMS statistics"""
-        today = datetime.now().date()
-        
-        stats = {
-            "total_sent": db.query(SMSArchive).filter(SMSArchive.status == "sent").count(),
-            "total_failed": db.query(SMSArchive).filter(SMSArchive.status == "failed").count(),
-            "total_pending": db.query(SMSArchive).filter(SMSArchive.status == "pending").count(),
-            "total_cost": db.query(SMSArchive).filter(SMSArchive.cost.isnot(None)).with_entities(
-                db.func.sum(SMSArchive.cost)
-            ).scalar() or 0,
-            "today_sent": db.query(SMSArchive).filter(
-                SMSArchive.status == "sent",
-                db.func.date(SMSArchive.sent_at) == today
-            ).count(),
-            "week_sent": 0,  # Can be calculated similarly
-            "month_sent": 0  # Can be calculated similarly
-        }
+        """Get SMS statistics from the daily_metrics rollup, one aggregate grouped by status"""
+        today = sms_day(None)
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        
+        def sent_since(day):
+            return func.coalesce(func.sum(DailyMetric.count).filter(DailyMetric.day >= day), 0)
         
-        return stats
+        rows = db.query(
+            DailyMetric.status,
+            func.coalesce(func.sum(DailyMetric.count), 0).label("total"),
+            func.coalesce(func.sum(DailyMetric.cost), 0).label("cost"),
+            sent_since(today).label("today"),
+            sent_since(week_start).label("week"),
+            sent_since(month_start).label("month")
+        ).filter(DailyMetric.metric == SMS).group_by(DailyMetric.status).all()
+        
+        by_status = {row.status: row for row in rows}
+        sent = by_status.get("sent")
+        
+        return {
+            "total_sent": int(sent.total) if sent else 0,
+            "total_failed": int(by_status["failed"].total) if "failed" in by_status else 0,
+            "total_pending": int(by_status["pending"].total) if "pending" in by_status else 0,
+            "total_cost": sum(int(row.cost) for row in rows),
+            "today_sent": int(sent.today) if sent else 0,
+            "week_sent": int(sent.week) if sent else 0,
+            "month_sent": int(sent.month) if sent else 0
+        }
 
 # Create instance
 sms_service = SMSService()
\ No newline at end of file
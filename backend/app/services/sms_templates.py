@@ -0,0 +1,71 @@
+import re
+from functools import lru_cache
+from typing import Callable, List, Union, Iterable
+
+from app.models.reservation import Reservation
+
+# Placeholder -> value getter; only getters of placeholders present in a template run
+PLACEHOLDERS: dict[str, Callable[[Reservation], str]] = {
+    "[نام حیوان]": lambda r: str(r.pet_name),
+    "[نام صاحب]": lambda r: str(r.owner_name),
+    "[تاریخ]": lambda r: r.next_visit_date.strftime("%Y/%m/%d") if r.next_visit_date else "",
+    "[نوع واکسن]": lambda r: str(r.vaccine_type),
+    "[نژاد]": lambda r: r.breed or "نامشخص",
+    "[وزن]": lambda r: f"{r.weight} کیلوگرم" if r.weight else "نامشخص",
+    "[قیمت]": lambda r: f"{r.price:,} تومان" if r.price else "نامشخص"
+}
+
+PLACEHOLDER_PATTERN = re.compile(r"(\[[^\[\]]+\])")
+
+class TemplateError(ValueError):
+    pass
+
+class CompiledTemplate:
+    def __init__(self, template: str, tokens: List[Union[str, Callable[[Reservation], str]]]):
+        self.template = template
+        self.tokens = tokens
+    
+    def render(self, reservation: Reservation) -> str:
+        """Render the template for one reservation"""
+        return "".join(
+            token if isinstance(token, str) else token(reservation)
+            for token in self.tokens
+        )
+    
+    def render_many(self, reservations: Iterable[Reservation]) -> List[str]:
+        """Render the template for many reservations"""
+        return [self.render(reservation) for reservation in reservations]
+
+@lru_cache(maxsize=256)
+def compile_template(template: str) -> CompiledTemplate:
+    """Parse a template into literal and placeholder tokens (cached by template text)"""
+    tokens = []
+    unknown = []
+    
+    for index, part in enumerate(PLACEHOLDER_PATTERN.split(template)):
+        if not part:
+            continue
+        # split() puts captured placeholders at odd indexes
+        if index % 2:
+            getter = PLACEHOLDERS.get(part)
+            if getter is None:
+                unknown.append(part)
+            else:
+                tokens.append(getter)
+        elif tokens and isinstance(tokens[-1], str):
+            tokens[-1] += part
+        else:
+            tokens.append(part)
+    
+    if unknown:
+        raise TemplateError(f"Unknown template variables: {', '.join(unknown)}")
+    
+    return CompiledTemplate(template, tokens)
+
+def render_template(template: str, reservation: Reservation) -> str:
+    """Render a template for one reservation"""
+    return compile_template(template).render(reservation)
+
+def render_batch(template: str, reservations: Iterable[Reservation]) -> List[str]:
+    """Render one template for many reservations"""
+    return compile_template(template).render_many(reservations)
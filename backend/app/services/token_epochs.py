@@ -0,0 +1,118 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class TokenEpochStore:
+    """Per-user token epoch in Redis with an in-memory fallback
+    
+    Tokens carry the epoch they were issued under ("ep"); bumping a user's
+    epoch revokes every token issued before. Keys never expire: tokens keep
+    being minted at the current epoch, so an expired key would restart the
+    count below them and stop revoking.
+    """
+    
+    KEY = "auth:epoch:{}"
+    REDIS_RETRY_SECONDS = 30
+    
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url if redis_url is not None else settings.REDIS_URL
+        self._memory: Dict[int, int] = {}
+        self._cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.TOKEN_EPOCH_CACHE_TTL)
+        self._redis = None
+        self._sync_redis = None
+        self._redis_retry_at = 0.0
+    
+    def _use_redis(self) -> bool:
+        return bool(self.redis_url) and time.monotonic() >= self._redis_retry_at
+    
+    def _redis_failed(self, error: Exception):
+        logger.warning("Token epochs falling back to memory: %s", error)
+        self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+    
+    async def get(self, user_id: int) -> int:
+        """Current token epoch for a user"""
+        epoch = self._cache.get(user_id)
+        if epoch is not None:
+            return epoch
+        
+        epoch = self._memory.get(user_id, 0)
+        if self._use_redis():
+            try:
+                epoch = max(epoch, int(await self._get_redis().get(self.KEY.format(user_id)) or 0))
+            except Exception as e:
+                self._redis_failed(e)
+        
+        self._cache.set(user_id, epoch)
+        return epoch
+    
+    async def is_revoked(self, user_id: int, token_epoch: int) -> bool:
+        return token_epoch < await self.get(user_id)
+    
+    def _get_redis(self):
+        if self._redis is None:
+            from redis import asyncio as aioredis
+            self._redis = aioredis.from_url(
+                self.redis_url, socket_timeout=1, socket_connect_timeout=1
+            )
+        return self._redis
+    
+    async def bump(self, user_id: int) -> int:
+        """Revoke every token issued to a user so far, returns the new epoch"""
+        epoch = self._memory.get(user_id, 0) + 1
+        
+        if self._use_redis():
+            try:
+                key = self.KEY.format(user_id)
+                async with self._get_redis().pipeline() as pipe:
+                    # PERSIST clears the TTL older versions set on the key
+                    results = await pipe.incr(key).persist(key).execute()
+                epoch = max(epoch, results[0])
+            except Exception as e:
+                self._redis_failed(e)
+        
+        self._set_local(user_id, epoch)
+        return epoch
+    
+    def bump_sync(self, user_id: int) -> int:
+        """Blocking bump() for sync code paths; async handlers must use bump()"""
+        epoch = self._memory.get(user_id, 0) + 1
+        
+        if self._use_redis():
+            try:
+                if self._sync_redis is None:
+                    import redis
+                    self._sync_redis = redis.Redis.from_url(
+                        self.redis_url, socket_timeout=1, socket_connect_timeout=1
+                    )
+                key = self.KEY.format(user_id)
+                pipe = self._sync_redis.pipeline()
+                pipe.incr(key)
+                pipe.persist(key)
+                epoch = max(epoch, pipe.execute()[0])
+            except Exception as e:
+                self._redis_failed(e)
+        
+        self._set_local(user_id, epoch)
+        return epoch
+    
+    def _set_local(self, user_id: int, epoch: int):
+        self._memory[user_id] = epoch
+        self._cache.pop(user_id)
+    
+    async def close(self):
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:
+                pass
+            self._redis = None
+        if self._sync_redis is not None:
+            self._sync_redis.close()
+            self._sync_redis = None
+
+token_epochs = TokenEpochStore()
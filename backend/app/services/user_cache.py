@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.cache import TTLCache, invalidate_on_write
+from app.core.config import settings
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+class UserAuthCache:
+    """Bounded TTL/LRU cache of users for get_current_user, keyed by user id
+    
+    Entries are detached snapshots (column values only), so callers must not
+    touch relationships or add them to a session. Writes to the users table
+    drop the local cache on commit; invalidate() also tells other workers via
+    Redis pub/sub when AUTH_CACHE_REDIS_INVALIDATION is on.
+    """
+    
+    CHANNEL = "auth:user-invalidate"
+    
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+        redis_url: Optional[str] = None
+    ):
+        self._cache = invalidate_on_write(TTLCache(
+            maxsize=maxsize or settings.AUTH_CACHE_SIZE,
+            ttl=settings.AUTH_CACHE_TTL if ttl is None else ttl
+        ))
+        self.redis_url = redis_url if redis_url is not None else settings.REDIS_URL
+        self._publisher = None
+        self._sync_publisher = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self._cache.ttl > 0
+    
+    def _key(self, user_id: int) -> tuple:
+        return (User.__tablename__, user_id)
+    
+    def get(self, user_id: int) -> Optional[User]:
+        """Cached user snapshot or None"""
+        if not self.enabled:
+            return None
+        return self._cache.get(self._key(user_id))
+    
+    def set(self, user: User):
+        """Cache a detached snapshot of a loaded user"""
+        if not self.enabled:
+            return
+        snapshot = User(**{
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+        })
+        self._cache.set(self._key(user.id), snapshot)
+    
+    async def invalidate(self, user_id: int):
+        """Drop a user here and, if enabled, in every other worker"""
+        self._cache.pop(self._key(user_id))
+        
+        if not settings.AUTH_CACHE_REDIS_INVALIDATION:
+            return
+        try:
+            if self._publisher is None:
+                from redis import asyncio as aioredis
+                self._publisher = aioredis.from_url(
+                    self.redis_url, socket_timeout=1, socket_connect_timeout=1
+                )
+            await self._publisher.publish(self.CHANNEL, str(user_id))
+        except Exception as e:
+            # Other workers still expire the entry after AUTH_CACHE_TTL
+            logger.warning("Could not publish user cache invalidation: %s", e)
+    
+    def invalidate_sync(self, user_id: int):
+        """Blocking invalidate() for sync code paths; async handlers must use invalidate()"""
+        self._cache.pop(self._key(user_id))
+        
+        if not settings.AUTH_CACHE_REDIS_INVALIDATION:
+            return
+        try:
+            if self._sync_publisher is None:
+                import redis
+                self._sync_publisher = redis.Redis.from_url(
+                    self.redis_url, socket_timeout=1, socket_connect_timeout=1
+                )
+            self._sync_publisher.publish(self.CHANNEL, str(user_id))
+        except Exception as e:
+            logger.warning("Could not publish user cache invalidation: %s", e)
+    
+    def start(self):
+        """Start listening for invalidations from other workers (call on app startup)"""
+        if settings.AUTH_CACHE_REDIS_INVALIDATION and self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def _listen(self):
+        from redis import asyncio as aioredis
+        
+        while True:
+            client = aioredis.from_url(self.redis_url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._cache.pop(self._key(int(message["data"])))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Missed messages are covered by the TTL; drop everything to be safe
+                logger.warning("User cache invalidation listener failed: %s", e)
+                self._cache.invalidate(User.__tablename__)
+                await asyncio.sleep(5)
+            finally:
+                await client.aclose()
+    
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._publisher is not None:
+            await self._publisher.aclose()
+            self._publisher = None
+        if self._sync_publisher is not None:
+            self._sync_publisher.close()
+            self._sync_publisher = None
+
+user_auth_cache = UserAuthCache()
@@ -0,0 +1,40 @@
+"""SMS delivery status poller
+
+Refreshes provider_status / delivered_at for recently sent messages, many
+message IDs per provider call:
+
+    python -m app.workers.delivery_poller
+"""
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import start_worker_metrics_server
+from app.services.sms_service import sms_service
+
+logger = logging.getLogger(__name__)
+
+async def run_delivery_poller():
+    """Poll delivery status every SMS_STATUS_POLL_INTERVAL seconds until cancelled"""
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                updated = await sms_service.refresh_delivery_status(db)
+                if updated:
+                    logger.info("Delivery status updated for %d messages", updated)
+            except Exception:
+                logger.exception("Delivery status poll failed")
+                db.rollback()
+            finally:
+                db.close()
+            
+            await asyncio.sleep(settings.SMS_STATUS_POLL_INTERVAL)
+    finally:
+        await sms_service.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_worker_metrics_server()
+    asyncio.run(run_delivery_poller())
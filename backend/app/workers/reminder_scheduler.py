@@ -0,0 +1,69 @@
+"""Reminder scheduler
+
+Periodically sends reminder SMS for due reservations. Batches are claimed
+with SELECT ... FOR UPDATE SKIP LOCKED, so any number of instances can run
+side by side without double sends:
+
+    python -m app.workers.reminder_scheduler
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import start_worker_metrics_server
+from app.models.user import User
+from app.services.sms_service import sms_service
+
+logger = logging.getLogger(__name__)
+
+def get_reminder_sender_id(db: Session) -> Optional[int]:
+    """Get the user recorded as sender of automatic reminders"""
+    if settings.REMINDER_SENDER_USER_ID:
+        return settings.REMINDER_SENDER_USER_ID
+    
+    user = db.query(User).filter(
+        User.is_active == True,
+        User.is_superuser == True
+    ).order_by(User.id).first()
+    return user.id if user else None
+
+async def send_due_reminders(db: Session) -> dict:
+    """Claim and send due reminders batch by batch until none are left"""
+    sent_by_user_id = get_reminder_sender_id(db)
+    if not sent_by_user_id:
+        logger.warning("No reminder sender user configured, skipping run")
+        return {"total": 0, "sent": 0, "failed": 0}
+    
+    return await sms_service.send_due_reminders(
+        db=db,
+        template=settings.REMINDER_TEMPLATE,
+        sent_by_user_id=sent_by_user_id
+    )
+
+async def run_reminder_scheduler():
+    """Run reminder batches every REMINDER_INTERVAL seconds until cancelled"""
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                totals = await send_due_reminders(db)
+                if totals["sent"] or totals["failed"]:
+                    logger.info("Reminders: %(sent)d sent, %(failed)d failed", totals)
+            except Exception:
+                logger.exception("Reminder run failed")
+                db.rollback()
+            finally:
+                db.close()
+            
+            await asyncio.sleep(settings.REMINDER_INTERVAL)
+    finally:
+        await sms_service.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_worker_metrics_server()
+    asyncio.run(run_reminder_scheduler())
@@ -0,0 +1,41 @@
+"""SMS outbox worker
+
+Drains pending SMSArchive rows and sends them through the SMS provider.
+Run one or more instances next to the API:
+
+    python -m app.workers.sms_outbox
+"""
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import start_worker_metrics_server
+from app.services.sms_service import sms_service
+
+logger = logging.getLogger(__name__)
+
+async def run_outbox_worker():
+    """Process outbox batches until cancelled"""
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                processed = await sms_service.process_outbox(db)
+            except Exception:
+                logger.exception("SMS outbox batch failed")
+                db.rollback()
+                processed = 0
+            finally:
+                db.close()
+            
+            # Only sleep when the outbox is drained
+            if not processed:
+                await asyncio.sleep(settings.SMS_OUTBOX_POLL_INTERVAL)
+    finally:
+        await sms_service.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_worker_metrics_server()
+    asyncio.run(run_outbox_worker())